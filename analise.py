@@ -0,0 +1,207 @@
+import functools
+import hashlib
+import json
+import os
+from datetime import date, datetime
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from loaders import DETAILS_DTYPES, read_table
+from util import REPOS_DETAILS, SNAPSHOT_DIR
+
+# Dias médios de um mês, usados no tempo de vida dos repositórios
+DIAS_POR_MES = 30.436875
+
+# Combinações de filtros (estrelas, meses) guardadas em memória
+MAX_FILTROS = 64
+
+
+def motor_parquet():
+    """
+    Biblioteca usada para ler e gravar Parquet (None se nenhuma estiver instalada)
+    """
+    for motor in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(motor)
+            return motor
+        except ImportError:
+            continue
+    return None
+
+
+def arquivo_snapshot(arquivo):
+    """
+    Caminho do snapshot colunar de um CSV: Parquet se houver pyarrow ou fastparquet,
+    senão pickle (também preserva os tipos, mas só é lido pelo pandas).
+    O nome inclui um hash do caminho real, para CSVs de mesmo nome em pastas diferentes
+    não dividirem o mesmo snapshot
+    """
+    nome = os.path.splitext(os.path.basename(arquivo))[0]
+    chave = hashlib.sha256(os.path.realpath(arquivo).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f'{nome}-{chave}' + ('.parquet' if motor_parquet() else '.pkl'))
+
+
+def versao_snapshot(snapshot):
+    """
+    Versão do CSV (st_mtime_ns, st_size) a partir da qual o snapshot foi gravado (None se desconhecida)
+    """
+    try:
+        with open(snapshot + '.json', 'r', encoding='utf-8') as file:
+            return tuple(json.load(file)['versao'])
+    except (IOError, ValueError, KeyError, TypeError):
+        return None
+
+
+def gravar_snapshot(df, snapshot, arquivo, versao_arquivo):
+    os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+    if snapshot.endswith('.parquet'):
+        df.to_parquet(snapshot + '.tmp', engine=motor_parquet(), index=False)
+    else:
+        df.to_pickle(snapshot + '.tmp', compression=None)
+    os.replace(snapshot + '.tmp', snapshot)
+    # Gravado depois do snapshot: um snapshot sem versão (ou com a antiga) é refeito
+    with open(snapshot + '.json.tmp', 'w', encoding='utf-8') as file:
+        json.dump({'arquivo': os.path.realpath(arquivo), 'versao': list(versao_arquivo)}, file)
+    os.replace(snapshot + '.json.tmp', snapshot + '.json')
+
+
+def ler_snapshot(snapshot):
+    if snapshot.endswith('.parquet'):
+        return pd.read_parquet(snapshot, engine=motor_parquet())
+    return pd.read_pickle(snapshot, compression=None)
+
+
+# arquivo -> (versão, DataFrame) já carregado neste processo
+_detalhes = dict()
+
+
+def versao(arquivo):
+    estado = os.stat(arquivo)
+    return estado.st_mtime_ns, estado.st_size
+
+
+def carregar_detalhes(arquivo=REPOS_DETAILS):
+    """
+    Detalhes dos repositórios com datas (UTC, sem fuso) e contagens (Int64) já convertidas.
+
+    O CSV só é lido e convertido quando muda: o resultado vai para um snapshot colunar
+    em SNAPSHOT_DIR, usado pelas próximas execuções, e fica em memória neste processo.
+    Não altere o DataFrame devolvido; use filtrar ou faça uma cópia.
+    """
+    atual = versao(arquivo)
+    if arquivo in _detalhes and _detalhes[arquivo][0] == atual:
+        return _detalhes[arquivo][1]
+
+    snapshot = arquivo_snapshot(arquivo)
+    df = None
+    if os.path.exists(snapshot) and versao_snapshot(snapshot) == atual:
+        try:
+            df = ler_snapshot(snapshot)
+        except Exception as e:  # snapshot corrompido ou de outra versão: refaz a partir do CSV
+            print(f'Ignorando {snapshot}: {e}')
+    if df is None:
+        df = read_table(arquivo, DETAILS_DTYPES)
+        gravar_snapshot(df, snapshot, arquivo, atual)
+    for coluna, tipo in DETAILS_DTYPES.items():
+        if tipo is str and coluna in df.columns:  # células vazias como ausentes, igual ao pd.read_csv padrão
+            df[coluna] = df[coluna].mask(df[coluna] == '')
+
+    _detalhes[arquivo] = (atual, df)
+    return df
+
+
+@functools.lru_cache(maxsize=MAX_FILTROS)
+def _filtrar(arquivo, versao_arquivo, stars, months, hoje):
+    df = carregar_detalhes(arquivo)
+    if stars:
+        df = filter_stars(df, stars)
+    if months is not None:
+        df = filter_pushed(df, months)
+    return df
+
+
+def filtrar(stars=0, months=None, arquivo=REPOS_DETAILS):
+    """
+    Repositórios com pelo menos stars estrelas e atualizados nos últimos months meses
+    (None: sem filtro de atividade).
+
+    Cada combinação (stars, months) é calculada uma vez por dia e por versão do CSV;
+    as chamadas seguintes só copiam o resultado guardado.
+    """
+    df = _filtrar(arquivo, versao(arquivo), stars, months, date.today())
+    return df.copy()
+
+
+def filter_stars(df: pd.DataFrame, stars: int) -> pd.DataFrame:
+    df_filtered = df[df['stargazers'] >= stars].copy()
+    return df_filtered
+
+
+def datas(coluna):
+    """
+    Converte uma coluna para datetime UTC sem fuso, se ainda não estiver convertida
+    """
+    if pd.api.types.is_datetime64_dtype(coluna):
+        return coluna
+    return pd.to_datetime(coluna, utc=True, errors='coerce').dt.tz_localize(None)
+
+
+def filter_pushed(df: pd.DataFrame, m: int) -> pd.DataFrame:
+    months_ago = pd.Timestamp.now(tz='UTC').tz_localize(None) - relativedelta(months=m)
+    df_filtered = df[datas(df['pushedAt']) >= months_ago]
+    return df_filtered
+
+
+def filter_issues(df: pd.DataFrame, issues: int) -> pd.DataFrame:
+    # Contagens ausentes (<NA>) não passam no filtro
+    issues_col = df['issues']
+    if not pd.api.types.is_numeric_dtype(issues_col):
+        issues_col = pd.to_numeric(issues_col, errors='coerce')
+
+    df_filtered = df[issues_col >= issues]
+
+    return df_filtered
+
+
+def adicionar_coluna_vida(df):
+    # Trabalha com uma cópia: o DataFrame original pode ser um resultado guardado por filtrar
+    df = df.copy()
+    df['createdAt'] = datas(df['createdAt'])
+
+    # Calcula a diferença em meses (média de dias/mês)
+    data_atual = datetime.now()
+    df['vida'] = ((data_atual - df['createdAt']).dt.days // DIAS_POR_MES).astype('Int64')
+
+    return df
+
+
+def extensao_mais_frequente_por_repositorio(df):
+    """
+    Retorna um DataFrame com a extensão mais frequente para cada repositório.
+
+    Parâmetros:
+    df (pd.DataFrame): DataFrame de entrada contendo as colunas 'repositorio' e 'extensão'
+
+    Retorna:
+    pd.DataFrame: DataFrame com as colunas 'repositorio' e 'extensão_mais_frequente'
+    """
+    # Verifica se as colunas necessárias existem no DataFrame
+    if not all(col in df.columns for col in ['repositorio', 'extensao']):
+        raise ValueError("O DataFrame deve conter as colunas 'repositorio' e 'extensao'")
+
+    # Normaliza o nome da extensão .yml (sem alterar o DataFrame recebido)
+    df = df[['repositorio', 'extensao']].replace(to_replace='.yaml', value='.yml')
+
+    # Agrupa por repositório e extensão, conta as ocorrências e pega a extensão mais frequente
+    resultado = (
+        df.groupby(['repositorio', 'extensao'])
+        .size()
+        .reset_index(name='contagem')
+        .sort_values(['repositorio', 'contagem'], ascending=[True, False])
+        .drop_duplicates('repositorio')
+        .rename(columns={'extensao': 'extensao_mais_frequente'})
+        [['repositorio', 'extensao_mais_frequente']]
+    )
+
+    return resultado
@@ -1,48 +1,594 @@
-import requests as rq
+import codecs
+import hashlib
+import json
+import os
+import re
+import tarfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import closing
+from functools import lru_cache
 
-def listar_arquivos_config(repo_full_name, token=None):
+import pandas as pd
+
+import http_cache
+import metrics
+import scheduler
+from config_files import CLASSIFICADOR
+from credenciais import TAMANHO_MAXIMO, escanear_arquivo, escanear_bytes
+from util import API_URL, ARCHIVE_CACHE_DIR, BLOB_CACHE_DIR
+
+# Bytes lidos por vez da resposta da árvore
+TAMANHO_BLOCO = 64 * 1024
+
+# Subárvores listadas ao mesmo tempo quando a árvore recursiva vem truncada
+MAX_WORKERS = 8
+
+# Formas de obter os arquivos: 'api' (árvore + um download por blob) ou 'tarball' (um arquivo .tar.gz por repositório)
+BACKENDS = ('api', 'tarball')
+
+# Tamanho máximo em disco dos caches de blobs e de tarballs (os usados há mais tempo são apagados primeiro)
+TAMANHO_CACHE_BLOBS = 1024 * 1024 * 1024
+TAMANHO_CACHE_TARBALLS = 4 * 1024 * 1024 * 1024
+
+INICIO_ARVORE = re.compile(r'"tree"\s*:\s*\[')
+TRUNCADA = re.compile(r'"truncated"\s*:\s*(true|false)')
+
+
+_cache_blobs = http_cache.DiskBudget(BLOB_CACHE_DIR, TAMANHO_CACHE_BLOBS)
+_cache_tarballs = http_cache.DiskBudget(ARCHIVE_CACHE_DIR, TAMANHO_CACHE_TARBALLS)
+
+
+def _validar_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"backend deve ser um de {BACKENDS}, não {backend!r}")
+
+
+class ErroGitHub(Exception):
+    """
+    Resposta inesperada da API do GitHub
+    """
+
+    def __init__(self, status_code, url):
+        super().__init__(f'Erro {status_code} ao acessar {url}')
+        self.status_code = status_code
+        self.url = url
+
+
+def iterar_itens_arvore(response):
+    """
+    Lê a resposta de git/trees em blocos, devolvendo um item de 'tree' por vez,
+    sem manter o JSON inteiro (nem a lista de itens) em memória.
+
+    Retorna (via StopIteration.value, ou seja, `truncada = yield from ...`):
+        bool: se o GitHub marcou a árvore como truncada
+    """
+    decodificador = json.JSONDecoder()
+    texto = codecs.getincrementaldecoder('utf-8')()
+    blocos = response.iter_content(TAMANHO_BLOCO)
+    buffer = ''
+    posicao = 0
+    no_array = False
+    for bloco in blocos:
+        buffer = buffer[posicao:] + texto.decode(bloco)
+        posicao = 0
+        if not no_array:
+            inicio = INICIO_ARVORE.search(buffer)
+            if not inicio:
+                continue
+            no_array = True
+            posicao = inicio.end()
+        while True:
+            while posicao < len(buffer) and buffer[posicao] in ' \t\r\n,':
+                posicao += 1
+            if posicao >= len(buffer):
+                break
+            if buffer[posicao] == ']':  # fim da lista, o restante traz 'truncated'
+                resto = buffer[posicao:] + ''.join(texto.decode(bloco) for bloco in blocos)
+                truncada = TRUNCADA.search(resto)
+                return bool(truncada) and truncada.group(1) == 'true'
+            try:
+                item, posicao = decodificador.raw_decode(buffer, posicao)
+            except ValueError:  # item incompleto, lê o próximo bloco
+                break
+            yield item
+    return False
+
+
+def _cabecalhos(token):
+    # Headers de autenticação
+    headers = {}
+    if token:
+        headers['Authorization'] = f'token {token}'
+    return headers
+
+
+def _arvore(repo_full_name, sha, headers, recursiva=True):
+    """
+    Itera sobre os itens de uma árvore do repositório, sem carregá-la inteira.
+    Retorna (via yield from) se a listagem veio truncada.
+    """
+    url = f'{API_URL}/repos/{repo_full_name}/git/trees/{sha}'
+    response = http_cache.get(url, headers=headers, params={'recursive': 1} if recursiva else None, stream=True)
+    with closing(response):
+        if response.status_code != 200:
+            raise ErroGitHub(response.status_code, url)
+        return (yield from iterar_itens_arvore(response))
+
+
+def _registrar_truncamento(arvore, estado):
+    """
+    Repassa os itens de _arvore e guarda em estado['truncada'] se a listagem veio truncada
+    """
+    estado['truncada'] = yield from arvore
+
+
+def _listar_subarvore(repo_full_name, prefixo, sha, headers):
+    """
+    Lista recursivamente uma subárvore. Se a listagem vier truncada, devolve também
+    os arquivos e as subárvores diretas, que serão listadas separadamente.
+
+    Retorna:
+        tuple: (lista de (caminho, sha) de arquivos de configuração, lista de (prefixo, sha) de subárvores)
+    """
+    estado = {}
+    encontrados = [
+        (prefixo + item['path'], item['sha'])
+        for item in _registrar_truncamento(_arvore(repo_full_name, sha, headers), estado)
+        if item['type'] == 'blob' and CLASSIFICADOR.e_config(item['path'])
+    ]
+    filhas = []
+    if estado['truncada']:
+        for item in _arvore(repo_full_name, sha, headers, recursiva=False):
+            if item['type'] == 'tree':
+                filhas.append((prefixo + item['path'] + '/', item['sha']))
+            elif item['type'] == 'blob' and CLASSIFICADOR.e_config(item['path']):
+                encontrados.append((prefixo + item['path'], item['sha']))
+    return encontrados, filhas
+
+
+def iterar_blobs_config(repo_full_name, token=None):
+    """
+    Itera sobre os arquivos de configuração de um repositório à medida que a árvore
+    é lida. Quando o GitHub trunca a árvore recursiva (repositórios muito grandes),
+    as subárvores são percorridas de forma preguiçosa e em paralelo, sem repetir
+    arquivos já encontrados.
+
+    Parâmetros:
+        repo_full_name (str): nome completo do repositório (ex: "owner/nome")
+        token (str): token de acesso GitHub (opcional)
+
+    Retorna:
+        Iterator[tuple]: (caminho, sha do blob) de cada arquivo de configuração
+
+    Lança:
+        ErroGitHub: se a árvore do repositório não puder ser obtida
+    """
+    headers = _cabecalhos(token)
+    vistos = set()
+
+    estado = {}
+    for item in _registrar_truncamento(_arvore(repo_full_name, 'HEAD', headers), estado):
+        if item['type'] == 'blob' and CLASSIFICADOR.e_config(item['path']):
+            vistos.add(item['path'])
+            yield item['path'], item['sha']
+
+    if not estado['truncada']:
+        return
+
+    # Árvore truncada: lista a raiz sem recursão e cada subárvore separadamente
+    print(f"Árvore de '{repo_full_name}' truncada, listando subárvores...")
+    metrics.inc('query_splits_total', collector='inventory')
+    subarvores = []
+    for item in _arvore(repo_full_name, 'HEAD', headers, recursiva=False):
+        if item['type'] == 'tree':
+            subarvores.append((item['path'] + '/', item['sha']))
+        elif item['type'] == 'blob' and item['path'] not in vistos and CLASSIFICADOR.e_config(item['path']):
+            vistos.add(item['path'])
+            yield item['path'], item['sha']
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pendentes = {executor.submit(_listar_subarvore, repo_full_name, prefixo, sha, headers) for prefixo, sha in subarvores}
+        while pendentes:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                encontrados, filhas = futuro.result()
+                for caminho, sha in encontrados:
+                    if caminho not in vistos:
+                        vistos.add(caminho)
+                        yield caminho, sha
+                for prefixo, sha in filhas:
+                    pendentes.add(executor.submit(_listar_subarvore, repo_full_name, prefixo, sha, headers))
+
+
+def listar_arquivos_config(repo_full_name, token=None, stream=False, backend='api'):
     """
     Lista arquivos de configuração comuns em um repositório público do GitHub.
     
     Parâmetros:
         repo_full_name (str): nome completo do repositório (ex: "owner/nome")
         token (str): token de acesso GitHub (opcional, para aumentar o limite de requisições)
+        stream (bool): se True, retorna um gerador que entrega os caminhos à medida que
+            a árvore é lida (erros de acesso são lançados como ErroGitHub)
+        backend (str): 'api' lê a árvore pela API; 'tarball' percorre o arquivo .tar.gz
+            do repositório (baixado uma vez por commit)
     
     Retorna:
         List[str]: lista de caminhos de arquivos de configuração encontrados
     """
+    _validar_backend(backend)
+    if backend == 'tarball':
+        caminhos = (caminho for caminho, _ in iterar_tarball(repo_full_name, token, conteudo=False))
+    else:
+        caminhos = (caminho for caminho, _ in iterar_blobs_config(repo_full_name, token))
+    if stream:
+        return caminhos
 
-    # Headers de autenticação
-    headers = {}
-    if token:
-        headers['Authorization'] = f'token {token}'
+    try:
+        return list(caminhos)
+    except ErroGitHub as e:
+        print(f"Erro ao acessar repositório: {e.status_code}")
+        return []
+
+
+@lru_cache(maxsize=1024)
+def _mapa_blobs(repo_full_name, token=None):
+    """
+    Caminho -> sha dos arquivos de configuração (a árvore vem do cache HTTP, então
+    repetir a consulta para um repositório inalterado custa um 304)
+    """
+    return dict(iterar_blobs_config(repo_full_name, token))
+
+
+def _mapa_blobs_ou_vazio(repo_full_name, token=None):
+    """
+    Como _mapa_blobs, mas um repositório inacessível (removido, privado, sem cota)
+    devolve um mapa vazio em vez de interromper o escaneamento dos outros
+    """
+    try:
+        return repo_full_name, _mapa_blobs(repo_full_name, token or None)
+    except ErroGitHub as e:
+        print(f"Erro ao acessar '{repo_full_name}': {e.status_code}")
+        return repo_full_name, {}
 
-    # Lista de extensões e nomes típicos de arquivos de configuração
-    padroes_config = [
-        '.env', '.ini', '.cfg', '.config', '.conf',
-        '.yaml', '.yml', '.json', 'settings.xml',
-        'config.json', 'config.yaml', 'settings.py',
-        'config.yml', 'docker-compose.yml'
-    ]
 
-    # Endpoint para obter a árvore de arquivos do repositório (modo recursivo = todos os arquivos)
-    url = f'https://api.github.com/repos/{repo_full_name}/git/trees/HEAD?recursive=1'
-    response = rq.get(url, headers=headers)
+def obter_blob(repo_full_name, sha, token=None):
+    """
+    Baixa o conteúdo de um blob para o cache endereçado pelo sha. Arquivos idênticos
+    (mesmo sha) em repositórios diferentes são baixados uma única vez.
+
+    Retorna:
+        str: caminho do arquivo no cache local
+    """
+    caminho = os.path.join(BLOB_CACHE_DIR, sha[:2], sha)
+    if os.path.exists(caminho):
+        _cache_blobs.touch(caminho)
+        metrics.inc('downloads_total', kind='blob', result='cached')
+        return caminho
+
+    headers = _cabecalhos(token)
+    headers['Accept'] = 'application/vnd.github.raw'
+    url = f'{API_URL}/repos/{repo_full_name}/git/blobs/{sha}'
+    response = scheduler.get(url, headers=headers, stream=True)
+    with closing(response):
+        if response.status_code != 200:
+            raise ErroGitHub(response.status_code, url)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho + '.tmp', 'wb') as arquivo:
+            for bloco in response.iter_content(TAMANHO_BLOCO):
+                arquivo.write(bloco)
+    os.replace(caminho + '.tmp', caminho)
+    metrics.inc('downloads_total', kind='blob', result='downloaded')
+    metrics.inc('download_bytes_total', os.path.getsize(caminho), kind='blob')
+    _cache_blobs.account(os.path.getsize(caminho))
+    return caminho
 
+
+def commit_head(repo_full_name, token=None):
+    """
+    Sha do commit apontado por HEAD (consulta condicional, custa um 304 se nada mudou)
+    """
+    headers = _cabecalhos(token)
+    headers['Accept'] = 'application/vnd.github.sha'
+    url = f'{API_URL}/repos/{repo_full_name}/commits/HEAD'
+    response = http_cache.get(url, headers=headers)
     if response.status_code != 200:
-        print(f"Erro ao acessar repositório: {response.status_code}")
-        return []
+        raise ErroGitHub(response.status_code, url)
+    return response.text.strip()
+
 
-    data = response.json()
-    arquivos = data.get('tree', [])
+def obter_tarball(repo_full_name, token=None):
+    """
+    Baixa o .tar.gz do repositório no commit atual para o cache local, que é
+    indexado pelo sha do commit (um repositório inalterado não é baixado de novo).
+
+    Retorna:
+        str: caminho do arquivo no cache local
+    """
+    sha = commit_head(repo_full_name, token)
+    caminho = os.path.join(ARCHIVE_CACHE_DIR, f'{sha}.tar.gz')
+    if os.path.exists(caminho):
+        _cache_tarballs.touch(caminho)
+        metrics.inc('downloads_total', kind='tarball', result='cached')
+        return caminho
+
+    url = f'{API_URL}/repos/{repo_full_name}/tarball/{sha}'
+    response = scheduler.get(url, headers=_cabecalhos(token), stream=True)
+    with closing(response):
+        if response.status_code != 200:
+            raise ErroGitHub(response.status_code, url)
+        os.makedirs(ARCHIVE_CACHE_DIR, exist_ok=True)
+        with open(caminho + '.tmp', 'wb') as arquivo:
+            for bloco in response.iter_content(TAMANHO_BLOCO):
+                arquivo.write(bloco)
+    os.replace(caminho + '.tmp', caminho)
+    metrics.inc('downloads_total', kind='tarball', result='downloaded')
+    metrics.inc('download_bytes_total', os.path.getsize(caminho), kind='tarball')
+    _cache_tarballs.account(os.path.getsize(caminho))
+    return caminho
+
+
+def sha_blob(conteudo):
+    """
+    Sha que o git daria ao conteúdo (o mesmo de iterar_blobs_config)
+    """
+    return hashlib.sha1(b'blob %d\0' % len(conteudo) + conteudo).hexdigest()
+
+
+def ler_tarball(caminho, conteudo=True):
+    """
+    Percorre um .tar.gz do GitHub em modo streaming (sem extrair para o disco),
+    entregando só os arquivos de configuração.
+
+    Parâmetros:
+        caminho (str): arquivo .tar.gz
+        conteudo (bool): se True, lê o conteúdo de cada arquivo (até TAMANHO_MAXIMO bytes)
+
+    Retorna:
+        Iterator[tuple]: (caminho no repositório, conteúdo em bytes ou None)
+    """
+    with tarfile.open(caminho, mode='r|gz') as tar:
+        for arquivo, membro in _membros_config(tar):
+            if conteudo and membro.size <= TAMANHO_MAXIMO:
+                yield arquivo, tar.extractfile(membro).read()
+            else:
+                yield arquivo, None
+
+
+def _membros_config(tar):
+    for membro in tar:
+        if not membro.isfile():
+            continue
+        # O GitHub coloca tudo dentro de uma pasta 'owner-repo-sha/'
+        arquivo = membro.name.split('/', 1)[-1]
+        if CLASSIFICADOR.e_config(arquivo):
+            yield arquivo, membro
+
+
+def ler_shas_tarball(caminho):
+    """
+    Como ler_tarball, mas entrega o sha do blob de cada arquivo de configuração (o mesmo
+    de iterar_blobs_config), calculado em blocos, sem limite de tamanho
+
+    Retorna:
+        Iterator[tuple]: (caminho no repositório, sha do blob)
+    """
+    with tarfile.open(caminho, mode='r|gz') as tar:
+        for arquivo, membro in _membros_config(tar):
+            h = hashlib.sha1(b'blob %d\0' % membro.size)
+            dados = tar.extractfile(membro)
+            for bloco in iter(lambda: dados.read(TAMANHO_BLOCO), b''):
+                h.update(bloco)
+            yield arquivo, h.hexdigest()
+
+
+def iterar_tarball(repo_full_name, token=None, conteudo=True):
+    """
+    Igual a ler_tarball, baixando antes o .tar.gz do repositório (se necessário)
+    """
+    return ler_tarball(obter_tarball(repo_full_name, token), conteudo)
+
+
+def escanear_tarball(caminho, arquivos=None):
+    """
+    Escaneia os arquivos de configuração de um .tar.gz em uma única passada
+    (executado nos processos do pool de escanear_credenciais).
+
+    Parâmetros:
+        caminho (str): arquivo .tar.gz
+        arquivos (Iterable[str]): arquivos a escanear (None escaneia todos os de configuração)
+
+    Retorna:
+        List[tuple]: (arquivo, sha do blob, regra, linha, trecho) de cada ocorrência
+    """
+    arquivos = None if arquivos is None else set(arquivos)
+    escaneados = {}
+    achados = []
+    for arquivo, dados in ler_tarball(caminho):
+        if dados is None or (arquivos is not None and arquivo not in arquivos):
+            continue
+        sha = sha_blob(dados)
+        if sha not in escaneados:
+            escaneados[sha] = escanear_bytes(dados)
+        achados.extend((arquivo, sha, regra, linha, trecho) for regra, linha, trecho in escaneados[sha])
+    return achados
+
+
+def contem_credenciais_sensiveis(repo_full_name, arquivo, token=None):
+    """
+    Verifica se um arquivo de configuração contém possíveis credenciais expostas.
+
+    Parâmetros:
+        repo_full_name (str): nome completo do repositório (ex: "owner/nome")
+        arquivo (str): caminho do arquivo no repositório
+        token (str): token de acesso GitHub (opcional)
+
+    Retorna:
+        bool: True se algum padrão de credencial foi encontrado
+    """
+    try:
+        sha = _mapa_blobs(repo_full_name, token or None).get(arquivo)
+        if sha is None:
+            return False
+        return bool(escanear_arquivo(obter_blob(repo_full_name, sha, token)))
+    except ErroGitHub as e:
+        print(f"Erro ao acessar '{arquivo}' em '{repo_full_name}': {e.status_code}")
+        return False
+
+
+def escanear_credenciais(df_config, token=None, max_workers=None, backend='api'):
+    """
+    Procura credenciais em todos os arquivos de um inventário de configuração.
+
+    Com backend='api', os blobs são baixados (em paralelo) para um cache endereçado
+    pelo sha e cada conteúdo distinto é escaneado uma única vez. Com backend='tarball',
+    cada repositório é baixado uma vez como .tar.gz e percorrido em streaming. Nos dois
+    casos o escaneamento é distribuído em um pool de processos.
+
+    Parâmetros:
+        df_config (pd.DataFrame): colunas 'repositorio' e 'arquivo' (e 'sha', opcional)
+        token (str): token de acesso GitHub (opcional)
+        max_workers (int): processos usados no escaneamento (padrão: número de CPUs)
+        backend (str): 'api' ou 'tarball'
 
-    # Filtrar apenas arquivos (não diretórios)
-    arquivos_config = [
-        item['path'] for item in arquivos 
-        if item['type'] == 'blob' and any(pat in item['path'].lower() for pat in padroes_config)
+    Retorna:
+        pd.DataFrame: uma linha por ocorrência, com as colunas 'repositorio', 'arquivo',
+        'sha', 'regra', 'linha' e 'trecho' (com o segredo mascarado)
+    """
+    _validar_backend(backend)
+    if backend == 'tarball':
+        return _escanear_credenciais_tarball(df_config, token, max_workers)
+
+    colunas = ['repositorio', 'arquivo', 'sha', 'regra', 'linha', 'trecho']
+    df = df_config[['repositorio', 'arquivo']].copy()
+    df['sha'] = df_config['sha'].astype(object) if 'sha' in df_config.columns else None
+    faltando = df['sha'].isna()
+    if faltando.any():
+        # Uma árvore por repositório com arquivos sem sha, em paralelo; repositórios inacessíveis ficam sem sha
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            mapas = dict(executor.map(lambda repo: _mapa_blobs_ou_vazio(repo, token),
+                                      df.loc[faltando, 'repositorio'].unique()))
+        df.loc[faltando, 'sha'] = [
+            mapas[repo].get(arquivo) for repo, arquivo in zip(df.loc[faltando, 'repositorio'], df.loc[faltando, 'arquivo'])
+        ]
+    df = df.dropna(subset=['sha'])
+
+    # Um download por conteúdo distinto
+    origem = df.drop_duplicates('sha').set_index('sha')['repositorio']
+
+    def baixar(sha):
+        try:
+            return sha, obter_blob(origem[sha], sha, token)
+        except ErroGitHub as e:
+            print(f"Erro ao baixar blob {sha} de '{origem[sha]}': {e.status_code}")
+            return sha, None
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        blobs = {sha: caminho for sha, caminho in executor.map(baixar, origem.index) if caminho}
+
+    # Um escaneamento por conteúdo distinto
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        achados = dict(zip(blobs, executor.map(escanear_arquivo, blobs.values(), chunksize=32)))
+
+    linhas = [
+        (repo, arquivo, sha, regra, linha, trecho)
+        for repo, arquivo, sha in zip(df['repositorio'], df['arquivo'], df['sha'])
+        for regra, linha, trecho in achados.get(sha, [])
     ]
+    return pd.DataFrame(linhas, columns=colunas)
+
+
+def _escanear_credenciais_tarball(df_config, token=None, max_workers=None):
+    colunas = ['repositorio', 'arquivo', 'sha', 'regra', 'linha', 'trecho']
+    arquivos = df_config.groupby('repositorio', sort=False)['arquivo'].apply(list)
+
+    def baixar(repo):
+        try:
+            return repo, obter_tarball(repo, token)
+        except ErroGitHub as e:
+            print(f"Erro ao baixar '{repo}': {e.status_code}")
+            return repo, None
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        tarballs = {repo: caminho for repo, caminho in executor.map(baixar, arquivos.index) if caminho}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        resultados = executor.map(escanear_tarball, tarballs.values(), [arquivos[repo] for repo in tarballs])
+        linhas = [
+            (repo, *achado)
+            for repo, achados in zip(tarballs, resultados)
+            for achado in achados
+        ]
+    return pd.DataFrame(linhas, columns=colunas)
+
+
+def _inventariar_repositorio(repo_full_name, token=None, backend='api'):
+    """
+    Inventário de um repositório; erros são devolvidos em vez de impressos
+
+    Retorna:
+        tuple: (lista de linhas do inventário, linha de erro ou None)
+    """
+    try:
+        if backend == 'tarball':  # mesmos shas da API, para escanear_credenciais poder usar qualquer backend
+            blobs = list(ler_shas_tarball(obter_tarball(repo_full_name, token)))
+        else:
+            blobs = list(iterar_blobs_config(repo_full_name, token))
+    except ErroGitHub as e:
+        metrics.inc('collector_errors_total', collector='inventory', status=e.status_code)
+        return [], {'repositorio': repo_full_name, 'status': e.status_code, 'erro': str(e)}
+    except Exception as e:  # falhas de rede, timeouts, tarballs corrompidos...
+        metrics.inc('collector_errors_total', collector='inventory', status=None)
+        return [], {'repositorio': repo_full_name, 'status': None, 'erro': repr(e)}
+    metrics.inc('repositories_total', collector='inventory')
+
+    shas = dict(blobs)
+    linhas = [
+        {
+            'repositorio': repo_full_name,
+            'arquivo': caminho,
+            'extensao': extensao,
+            'em_pasta_config': em_pasta_config,
+            'sha': shas[caminho]
+        }
+        for caminho, extensao, em_pasta_config in CLASSIFICADOR.classificar(shas)
+    ]
+    return linhas, None
+
+
+def inventariar_config(repositorios, token=None, max_workers=MAX_WORKERS, backend='api'):
+    """
+    Lista e classifica os arquivos de configuração de vários repositórios.
+
+    Os repositórios são processados por um pool limitado de threads que compartilham
+    a mesma sessão HTTP (conexões reaproveitadas, sem um novo handshake TLS por
+    requisição). A ordem de entrada é preservada.
+
+    Parâmetros:
+        repositorios (Iterable[str]): nomes completos dos repositórios (ex: "owner/nome")
+        token (str): token de acesso GitHub (opcional)
+        max_workers (int): repositórios processados ao mesmo tempo
+        backend (str): 'api' ou 'tarball' (veja listar_arquivos_config)
+
+    Retorna:
+        tuple: (df_config com as colunas 'repositorio', 'arquivo', 'extensao',
+        'em_pasta_config' e 'sha'; df_erros com 'repositorio', 'status' e 'erro')
+    """
+    _validar_backend(backend)
+    repositorios = list(repositorios)
+    linhas = []
+    erros = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        resultados = executor.map(lambda repo: _inventariar_repositorio(repo, token, backend), repositorios)
+        for i, (linhas_repo, erro) in enumerate(resultados, start=1):
+            linhas.extend(linhas_repo)
+            if erro:
+                erros.append(erro)
+            if i % 50 == 0:
+                print(f'Inventariados {i} de {len(repositorios)} repositórios ({len(erros)} com erro).')
 
-    return arquivos_config
+    df_config = pd.DataFrame(linhas, columns=['repositorio', 'arquivo', 'extensao', 'em_pasta_config', 'sha'])
+    df_erros = pd.DataFrame(erros, columns=['repositorio', 'status', 'erro'])
+    return df_config, df_erros
 
 
 # 🔍 Exemplo de uso:
@@ -0,0 +1,214 @@
+"""
+End-to-end throughput benchmark of the collectors against the local mock_github.py server.
+
+Every scenario runs the real collector code (scheduler, HTTP cache, batching, pools)
+with GITHUB_API_URL pointing at the mock and RPA_RESOURCE_DIR pointing at a temporary
+directory, and reports repositories per second, requests per repository and quota used.
+With --baseline, the results are compared to a previous --output and regressions make
+the benchmark exit with status 1.
+
+Usage: python benchmark.py [--scenario details --scenario inventory] [--repos 500] [--tokens 4]
+                           [--latency 0.05 --error-403 0.01 --error-502 0.01]
+                           [--output results.json] [--baseline results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import mock_github
+
+SCENARIOS = ('search', 'code', 'details', 'details-incremental', 'inventory', 'inventory-warm', 'scan')
+
+# Relative change tolerated before a metric is reported as a regression
+TOLERANCE = 0.2
+
+# Rate limits used by default: high enough that the scheduler pacing does not dominate
+LIMITS = {
+    'core': 1000000,
+    'search': 100000,
+    'code_search': 100000,
+    'graphql': 1000000,
+}
+
+HEADERS = dict()  # the scheduler adds a token from GITHUB_TOKENS
+
+
+def full_names(fixture, repos):
+    with open(os.path.join(mock_github.FIXTURES_DIR, fixture), 'r', encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    return lines[0], [line for line in lines[1:] if '/' in line.split(',', 1)[0]][:repos]
+
+
+def run_search(args, state):
+    import collect
+
+    query = collect.load_query()
+    partitions = collect.plan(HEADERS, min_stars=args.min_stars, last_activity=args.last_activity)
+    repositories = dict()
+    with ThreadPoolExecutor(max_workers=collect.MAX_WORKERS) as executor:
+        for result in executor.map(lambda p: collect.crawl(p[0], p[1], query, HEADERS), partitions):
+            repositories.update(result)
+    return len(repositories)
+
+
+def run_code(args, state):
+    import collect_by_code
+
+    return len(collect_by_code.main())
+
+
+def run_details(args, state):
+    import collect_by_code_details
+    from util import REPOS_BY_CODE, REPOS_DETAILS
+
+    header, lines = full_names('projects_2025_rpa_by_code.csv', args.repos)
+    with open(REPOS_BY_CODE, 'w', encoding='utf-8') as file:
+        file.write('\n'.join([header] + lines) + '\n')
+    collect_by_code_details.main()
+    with open(REPOS_DETAILS, 'r', encoding='utf-8') as file:
+        return sum(1 for _ in file) - 1
+
+
+def run_details_incremental(args, state):
+    import collect_by_code_details
+    from util import REPOS_DETAILS
+
+    collect_by_code_details.main(incremental=True)  # after 'details': nothing changed on the mock
+    with open(REPOS_DETAILS, 'r', encoding='utf-8') as file:
+        return sum(1 for _ in file) - 1
+
+
+def run_inventory(args, state):
+    import api_github
+
+    _, lines = full_names('projects_2025_rpa_by_code.csv', args.repos)
+    repositories = list(dict.fromkeys(line.split(',', 1)[0] for line in lines))
+    df_config, df_erros = api_github.inventariar_config(repositories, backend=args.backend)
+    state['df_config'] = df_config
+    return len(repositories) - len(df_erros)
+
+
+def run_scan(args, state):
+    import api_github
+
+    df_config = state.get('df_config')
+    if df_config is None:
+        run_inventory(args, state)
+        df_config = state['df_config']
+    api_github.escanear_credenciais(df_config, backend=args.backend)
+    return df_config['repositorio'].nunique()
+
+
+RUNNERS = {
+    'search': run_search,
+    'code': run_code,
+    'details': run_details,
+    'details-incremental': run_details_incremental,
+    'inventory': run_inventory,
+    'inventory-warm': run_inventory,  # same repositories again: exercises the HTTP cache (304s)
+    'scan': run_scan,
+}
+
+
+def measure(name, args, state, url):
+    requests.post(url + '/_reset')
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        repos = RUNNERS[name](args, state)
+    elapsed = time.perf_counter() - start
+    stats = requests.get(url + '/_stats').json()
+    request_count = stats.get('requests', 0)
+    return {
+        'repos': repos,
+        'elapsed': round(elapsed, 3),
+        'repos_per_sec': round(repos / elapsed, 2) if elapsed else None,
+        'requests': request_count,
+        'requests_per_repo': round(request_count / repos, 3) if repos else None,
+        'quota': {k[len('quota.'):]: v for k, v in stats.items() if k.startswith('quota.')},
+        'not_modified': stats.get('not_modified', 0),
+        'errors': sum(v for k, v in stats.items() if k.startswith('status.') and k[len('status.'):] >= '400'),
+        'bytes': stats.get('bytes', 0),
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    :return: list of messages describing metrics that got worse than the baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous['repos_per_sec'] and result['repos_per_sec'] < previous['repos_per_sec'] * (1 - tolerance):
+            regressions.append(f'{name}: {result["repos_per_sec"]} repos/s (baseline {previous["repos_per_sec"]})')
+        if previous['requests_per_repo'] and result['requests_per_repo'] and \
+                result['requests_per_repo'] > previous['requests_per_repo'] * (1 + tolerance):
+            regressions.append(f'{name}: {result["requests_per_repo"]} requests/repo (baseline {previous["requests_per_repo"]})')
+        used, before = sum(result['quota'].values()), sum(previous['quota'].values())
+        if before and used > before * (1 + tolerance):
+            regressions.append(f'{name}: {used} quota points (baseline {before})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='scenario to run (default: all)')
+    parser.add_argument('--repos', type=int, default=500, help='repositories used by details, inventory and scan')
+    parser.add_argument('--min-stars', type=int, default=200, help='search scenario: minimum number of stars')
+    parser.add_argument('--last-activity', type=int, default=3650, help='search scenario: days of push activity')
+    parser.add_argument('--tokens', type=int, default=1, help='size of the token pool (each token has its own budget)')
+    parser.add_argument('--backend', choices=('api', 'tarball'), default='api', help='inventory and scan backend')
+    parser.add_argument('--output', help='writes the results as JSON')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--verbose', action='store_true', help='shows the output of the collectors')
+    mock_github.add_arguments(parser)
+    parser.set_defaults(window=60)
+    args = parser.parse_args()
+    args.limit = [f'{resource}={limit}' for resource, limit in LIMITS.items()] + (args.limit or [])
+
+    mock = mock_github.from_arguments(args)
+    url = mock.start()
+    results = dict()
+    with tempfile.TemporaryDirectory() as resources:
+        # Must be set before the collectors (and util) are imported
+        os.environ['GITHUB_API_URL'] = url
+        os.environ['RPA_RESOURCE_DIR'] = resources
+        os.environ['GITHUB_TOKENS'] = ','.join(f'benchmark{i}' for i in range(args.tokens))
+        state = dict()
+        try:
+            for name in args.scenario or SCENARIOS:
+                results[name] = measure(name, args, state, url)
+                result = results[name]
+                print(f'{name:15} {result["repos"]:6} repos {result["elapsed"]:8.2f}s {result["repos_per_sec"]:9.2f} repos/s '
+                      f'{result["requests_per_repo"] or 0:7.3f} requests/repo quota {result["quota"]} '
+                      f'({result["not_modified"]} not modified, {result["errors"]} errors)')
+        finally:
+            mock.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            exit(1)
+        print('No regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Entry point of the pipeline: one subcommand per stage, plus quick status and lookups.
+
+Each subcommand imports the modules it needs only when it runs, so status checks and
+single-repository lookups start without pandas or matplotlib, and
+'run' chains several stages in one process (sharing the store, the scheduler budgets,
+the HTTP cache and the GraphQL documents already loaded).
+
+Usage: python cli.py status
+       python cli.py repo owner/name [--fetch]
+       python cli.py search | code | details [--incremental] | intersect
+       python cli.py inventory [--stars 250 --months 15 | --repos owner/name ...] [--backend tarball] [--scan]
+       python cli.py report [relatorio.py options]
+       python cli.py run search code details intersect
+"""
+import argparse
+import json
+import os
+import sys
+
+import util
+
+STAGES = ('search', 'code', 'details', 'intersect', 'inventory', 'report')
+
+
+def search(args):
+    import collect
+
+    collect.main()
+
+
+def code(args):
+    import collect_by_code
+
+    collect_by_code.main()
+
+
+def details(args):
+    import collect_by_code_details
+
+    collect_by_code_details.main(incremental=getattr(args, 'incremental', False))
+
+
+def intersect(args):
+    import collect_intersect
+
+    collect_intersect.main()
+
+
+def inventory(args):
+    """
+    Lists (and optionally scans) the configuration files of the repositories given with
+    --repos, or of the details filtered by --stars and --months
+    """
+    import api_github
+
+    if getattr(args, 'repos', None):
+        repositories = args.repos
+    else:
+        import analise
+
+        repositories = analise.filtrar(args.stars, args.months)['repository']
+    df_config, df_erros = api_github.inventariar_config(repositories, backend=args.backend)
+    df_config.to_csv(util.CONFIG_FILES, index=False)
+    df_erros.to_csv(util.CONFIG_ERRORS, index=False)
+    print(f'{len(df_config)} configuration files in {df_config["repositorio"].nunique()} repositories '
+          f'({len(df_erros)} errors) saved to {util.CONFIG_FILES}.')
+    if args.scan:
+        df_credenciais = api_github.escanear_credenciais(df_config, backend=args.backend)
+        df_credenciais.to_csv(util.CREDENTIALS, index=False)
+        print(f'{len(df_credenciais)} possible credentials saved to {util.CREDENTIALS}.')
+
+
+def report(args):
+    import relatorio
+
+    if args.command == 'report':
+        relatorio.main(args.options)
+    else:  # run: same filter as inventory
+        relatorio.main(['--stars', str(args.stars), '--months', str(args.months)])
+
+
+COMMANDS = {
+    'search': search,
+    'code': code,
+    'details': details,
+    'intersect': intersect,
+    'inventory': inventory,
+    'report': report,
+}
+
+
+def run(args):
+    for stage in args.stages:
+        print(f'== {stage} ==')
+        COMMANDS[stage](args)
+
+
+def status(args):
+    """
+    Local state of the pipeline, without touching the network
+    """
+    import scheduler
+    import store
+
+    print(f'Resources: {util.RESOURCE_DIR}')
+    print(f'API: {util.API_URL}')
+    print(f'Tokens: {len(scheduler.tokens_from_env())}')
+
+    if os.path.exists(util.DATABASE):
+        database = store.Store(import_csv=False)
+        for table in store.TABLES:
+            print(f'{table:20} {database.count(table):8} rows')
+        database.close()
+    else:
+        print(f'No database yet ({util.DATABASE}).')
+
+    for filename in (util.PROJECTS_FILE, util.REPOS_BY_CODE, util.REPOS_DETAILS, util.REPOS_INTERSECT,
+                     util.CONFIG_FILES, util.CREDENTIALS):
+        if os.path.exists(filename):
+            print(f'{os.path.basename(filename):45} {os.path.getsize(filename):12} bytes')
+    if os.path.exists(util.REPOS_DETAILS_LOG):
+        with open(util.REPOS_DETAILS_LOG, 'r', encoding='utf-8') as log:
+            print(f'Interrupted details run: {sum(1 for _ in log)} repositories in {util.REPOS_DETAILS_LOG}')
+    try:
+        with open(util.PAGE_SIZE_STATE, 'r', encoding='utf-8') as file:
+            sizes = json.load(file)
+        print('Page sizes: ' + ', '.join(f'{name}={state["size"]}' for name, state in sorted(sizes.items())))
+    except (IOError, ValueError):
+        pass
+
+
+def repo(args):
+    """
+    Everything the store knows about one repository (and, with --fetch, its current details)
+    """
+    import store
+
+    database = store.Store(import_csv=False) if os.path.exists(util.DATABASE) else None
+    found = dict()
+    if database:
+        for table in ('projects', 'details', 'by_code'):
+            row = database.get(table, args.repository)
+            if row:
+                found[table] = row
+        search_strings = database.query('SELECT search_string FROM by_code_membership WHERE repository = ?',
+                                        (args.repository,))
+        if search_strings:
+            found['search_strings'] = [row['search_string'] for row in search_strings]
+    if args.fetch:
+        import collect_by_code_details
+
+        owner, name = args.repository.split('/', 1)
+        data = collect_by_code_details.fetch_repo_data(owner, name)
+        found['github'] = collect_by_code_details.to_row(data, None) if data else None
+    if not found:
+        print(f'{args.repository} not found (use --fetch to ask GitHub).')
+        exit(1)
+    print(json.dumps(found, indent=2, ensure_ascii=False))
+
+
+def arguments(parser):
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    commands.add_parser('status', help='local state of the pipeline').set_defaults(function=status)
+
+    command = commands.add_parser('repo', help='looks up one repository')
+    command.add_argument('repository', help='owner/name')
+    command.add_argument('--fetch', action='store_true', help='also fetches its details from GitHub')
+    command.set_defaults(function=repo)
+
+    commands.add_parser('search', help='repository search (collect.py)').set_defaults(function=search)
+    commands.add_parser('code', help='code search (collect_by_code.py)').set_defaults(function=code)
+    command = commands.add_parser('details', help='details of the code search hits (collect_by_code_details.py)')
+    command.add_argument('--incremental', action='store_true', help='only fetches repositories pushed since the last run')
+    command.set_defaults(function=details)
+    commands.add_parser('intersect', help='repository search x code search (collect_intersect.py)') \
+        .set_defaults(function=intersect)
+
+    command = commands.add_parser('inventory', help='configuration files of the filtered repositories')
+    inventory_arguments(command)
+    command.set_defaults(function=inventory)
+
+    # The options of relatorio.py (including --help) are passed through by main
+    commands.add_parser('report', help='headless plots and summary (relatorio.py)', add_help=False) \
+        .set_defaults(function=report)
+
+    command = commands.add_parser('run', help='runs several stages in order, in one process')
+    command.add_argument('stages', nargs='+', choices=STAGES)
+    command.add_argument('--incremental', action='store_true', help='details: incremental refresh')
+    inventory_arguments(command)
+    command.set_defaults(function=run)
+
+
+def inventory_arguments(parser):
+    parser.add_argument('--stars', type=int, default=250, help='minimum number of stars')
+    parser.add_argument('--months', type=int, default=15, help='months of recent push activity')
+    parser.add_argument('--repos', nargs='+', help='repositories (owner/name) instead of the filter')
+    parser.add_argument('--backend', choices=('api', 'tarball'), default='api')
+    parser.add_argument('--scan', action='store_true', help='also scans the files for credentials')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments(parser)
+    args, options = parser.parse_known_args(argv)
+    if options and args.command != 'report':
+        parser.error(f'unrecognized arguments: {" ".join(options)}')
+    args.options = options
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,120 @@
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+import page_size
+import scheduler
+from util import API_URL
+
+SEARCH_URL = API_URL + '/search/code'
+
+# Results per page, adjusted by page_size.PageSizeController between these limits (fewer
+# results per page cost more requests from the code search budget, so it never goes too low)
+PER_PAGE = 100
+MIN_PER_PAGE = 30
+
+# GitHub never returns more than 1,000 results for a single search query
+MAX_RESULTS = 1000
+
+# Files larger than this are not indexed by code search
+MAX_FILE_SIZE = 384 * 1024
+
+# Search requests in flight (the scheduler keeps them within the code search budget)
+MAX_WORKERS = 4
+
+
+def size_filter(query, low, high):
+    return f'{query} size:{low}..{high}'
+
+
+def split(low, high):
+    """
+    Splits a size range in two around its geometric mean, since most files are small
+    """
+    middle = int(math.sqrt((low + 1) * (high + 1)))
+    middle = min(max(middle, low), high - 1)
+    return (low, middle), (middle + 1, high)
+
+
+def page_controller():
+    return page_size.controller('code', initial=PER_PAGE, minimum=MIN_PER_PAGE, maximum=PER_PAGE)
+
+
+def search_page(query, page, headers, per_page=PER_PAGE):
+    """
+    Retrieves one page of code search results (the scheduler already retries transient
+    server errors)
+    :return: decoded response, or None if GitHub did not answer with 200
+    """
+    response = scheduler.get(SEARCH_URL, params={'q': query, 'per_page': per_page, 'page': page}, headers=headers)
+    if response.status_code != 200:
+        print(f'Erro {response.status_code} na busca "{query}" (página {page}): {response.reason}')
+        metrics.inc('collector_errors_total', collector='code', status=response.status_code)
+        return None
+    data = response.json()
+    if data.get('incomplete_results'):  # GitHub search timed out
+        page_controller().failure(per_page, reason='incomplete_results')
+    else:
+        page_controller().success(per_page, response.elapsed.total_seconds())
+    return data
+
+
+def crawl(search_strings, headers, resume=None, abandoned=None):
+    """
+    Runs every search string to full coverage despite the 1,000 results cap.
+
+    The first page of a query (up to 100 results) doubles as a probe of total_count: if the
+    query has more than MAX_RESULTS hits it is split into size: ranges, recursively,
+    until every sub-query is under the cap, and only then its remaining pages are
+    fetched with the page size chosen for its probe. Probes and pages of all search
+    strings share one worker pool.
+
+    Each probe or page is a task (kind, search string, low, high, page, per page); the
+    ones GitHub keeps failing on are appended to abandoned, and can be passed back as
+    resume to run only them (and whatever they lead to) later.
+    :param search_strings: code search queries
+    :param headers: request headers (authentication is required by code search)
+    :param resume: tasks abandoned by a previous run, run instead of probing every search string
+    :param abandoned: list that receives the tasks given up on
+    :return: generator of (search_string, items) tuples, one per page retrieved
+    """
+    def run(task):
+        kind, search_string, low, high, page, per_page = task
+        query = search_string if low is None else size_filter(search_string, low, high)
+        if kind == 'probe':
+            page, per_page = 1, page_controller().page_size()  # kept for every page of the query
+        return (kind, search_string, low, high, page, per_page), query, search_page(query, page, headers, per_page)
+
+    if resume is None:
+        resume = [('probe', search_string, None, None, 1, None) for search_string in search_strings]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = {executor.submit(run, tuple(task)) for task in resume}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, query, data = future.result()
+                kind, search_string, low, high, page, per_page = task
+                if data is None:
+                    print(f'Desistindo da busca "{query}" (página {page}).')
+                    metrics.event('code_query_abandoned', query=query, page=page)
+                    if abandoned is not None:
+                        abandoned.append(task)
+                    continue
+                items = data.get('items', [])
+                if kind == 'probe':
+                    total = data.get('total_count', 0)
+                    if total > MAX_RESULTS and (low is None or high > low):
+                        low, high = (0, MAX_FILE_SIZE) if low is None else (low, high)
+                        print(f'{total} resultados para "{query}", dividindo por tamanho...')
+                        metrics.inc('query_splits_total', collector='code')
+                        for low_part, high_part in split(low, high):
+                            pending.add(executor.submit(run, ('probe', search_string, low_part, high_part, 1, None)))
+                    else:
+                        pages = math.ceil(min(total, MAX_RESULTS) / per_page)
+                        print(f'{total} resultados para "{query}" ({pages} páginas)')
+                        metrics.event('code_query', query=query, total=total, pages=pages)
+                        for page in range(2, pages + 1):
+                            pending.add(executor.submit(run, ('page', search_string, low, high, page, per_page)))
+                metrics.inc('search_results_total', len(items), collector='code')
+                yield search_string, items
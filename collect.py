@@ -1,74 +1,186 @@
 import datetime
-import os
+import functools
+import re
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pprint import pprint
 
-import pandas as pd
-import requests
-
-from util import PROJECTS_FILE
+import metrics
+import page_size
+import scheduler
+import store
+from util import GRAPHQL_URL, PROJECTS_FILE, QUERY_FILE
 
 # Minimum number of stars
-# MIN_STARS = 700
+MIN_STARS = 200
 
 # Maximum number of stars (None for no maximum limit)
-# MAX_STARS = 900
+MAX_STARS = None
 
+# Number of days to check recent push activity in the repository
+LAST_ACTIVITY = 120
 
+# GitHub never returns more than 1,000 repositories for a single search query
+MAX_RESULTS = 1000
 
-def load():
-    repositories = dict()
-    print(f'Loading repositories from {PROJECTS_FILE}...', end=' ')
-    try:
-        df = pd.read_csv(PROJECTS_FILE, keep_default_na=False)
-        for i, row in df.iterrows():
-            repo = row.to_dict()
-            repositories[repo['owner'] + '/' + repo['name']] = repo
-        print('Done!')
-    except IOError:
-        print('Failed!')
-    return repositories
+# Partitions probed or crawled at the same time
+MAX_WORKERS = 4
 
+# GraphQL points a page may cost (out of the 5,000 per hour of each token); pricier pages shrink the page size
+MAX_COST = 10
 
-def save(repositories):
-    repositories.update(load())
-    print(f'Saving repositories to {PROJECTS_FILE}...', end=' ')
-    df = pd.DataFrame(repositories.values())
-    df.loc[df.description.str.contains('(?i)\\bmirror\\b', na=False), 'isMirror'] = True  # Check 'mirror' in the description
+# Consecutive failures (502/504 at the minimum page size, or bodies that are not JSON) after which
+# a partition is given up; also the attempts of each count probe
+MAX_FAILURES = 5
 
-    df.createdAt = pd.to_datetime(df.createdAt, infer_datetime_format=True, errors='coerce')
-    df.pushedAt = pd.to_datetime(df.pushedAt, infer_datetime_format=True, errors='coerce')
+# Seconds before retrying a failed count probe, doubled at each new attempt
+RETRY_BACKOFF = 1
 
-    if pd.api.types.is_datetime64_any_dtype(df['createdAt']):
-        df['createdAt'] = df['createdAt'].dt.tz_localize(None)
-    else:
-        print("Aviso: 'createdAt' não pôde ser convertido corretamente para datetime.")
-        print(df['createdAt'].head())  # Mostra os primeiros valores para depuração
+COUNT_QUERY = '''
+query ($filter: String!) {
+  search(query: $filter, type: REPOSITORY, first: 0) { repositoryCount }
+  rateLimit { cost remaining resetAt }
+}
+'''
 
-    if pd.api.types.is_datetime64_any_dtype(df['pushedAt']):
-        df['pushedAt'] = df['pushedAt'].dt.tz_localize(None)
-    else:
-        print("Aviso: 'pushedAt' não pôde ser convertido corretamente para datetime.")
-        print(df['pushedAt'].head())  # Mostra os primeiros valores para depuração
 
-    df.sort_values('stargazers', ascending=False, inplace=True)
+def checkpoint(repositories):
+    """
+    Upserts the repositories of a finished partition into the store (one transaction,
+    whatever the number of repositories already collected)
+    """
+    for repository in repositories.values():
+        if re.search('(?i)\\bmirror\\b', repository.get('description') or ''):
+            repository['isMirror'] = True  # Check 'mirror' in the description
+    store.default().upsert('projects', repositories.values())
+
+
+@functools.lru_cache()
+def load_query(filename=QUERY_FILE):
+    """
+    GraphQL document of the repository search, read once per process
+    """
+    with open(filename, 'r') as file:
+        return file.read()
+
+
+def save():
+    from loaders import normalize_dates  # pandas is only needed to export the CSV
+
+    print(f'Saving repositories to {PROJECTS_FILE}...', end=' ')
+    columns = [column for column, _ in store.TABLES['projects'] if column != 'repository']
+    df = store.default().frame(f'SELECT {", ".join(columns)} FROM projects ORDER BY stargazers DESC', 'projects')
+
+    normalize_dates(df)
+
     df.to_csv(PROJECTS_FILE, index=False)
     print('Done!')
 
 
-def query_filter(min_stars, max_stars, last_activity=120):
+def query_filter(min_stars, max_stars, last_activity=120, pushed=None):
     """
     Builds the query filter string compatible to GitHub
     :param min_stars: minimum number of stargazers in the repository
+    :param max_stars: maximum number of stargazers in the repository (None for no maximum limit)
     :param last_activity: number of days to check recent push activity in the repository
+    :param pushed: (first, last) dates of the last push, replaces last_activity when given
     :return: query filter string compatible to GitHub
     """
-    date = datetime.datetime.now() - datetime.timedelta(days=last_activity)
+    if pushed:
+        pushed = f'{pushed[0]:%Y-%m-%d}..{pushed[1]:%Y-%m-%d}'
+    else:
+        date = datetime.datetime.now() - datetime.timedelta(days=last_activity)
+        pushed = f'>={date:%Y-%m-%d}'
     if max_stars:
         stars = f'{min_stars}..{max_stars}'
     else:
         stars = f'>={min_stars}'
-    return f'is:public archived:false fork:false stars:{stars} pushed:>={date:%Y-%m-%d} sort:stars-asc'
+    return f'is:public archived:false fork:false stars:{stars} pushed:{pushed} sort:stars-asc'
+
+
+def partition_filter(partition):
+    min_stars, max_stars, first, last = partition
+    return query_filter(min_stars, max_stars, pushed=(first, last))
+
+
+def split_partition(partition):
+    """
+    Splits a partition in two disjoint halves, by stars first and then by push date
+    :param partition: (min_stars, max_stars, first pushed date, last pushed date)
+    :return: tuple with the two halves, or None if the partition cannot be split
+    """
+    min_stars, max_stars, first, last = partition
+    if max_stars is None:
+        return (min_stars, 2 * min_stars - 1, first, last), (2 * min_stars, None, first, last)
+    if max_stars > min_stars:
+        middle = (min_stars + max_stars) // 2
+        return (min_stars, middle, first, last), (middle + 1, max_stars, first, last)
+    if last > first:
+        middle = first + (last - first) // 2
+        return (min_stars, max_stars, first, middle), (min_stars, max_stars, middle + datetime.timedelta(days=1), last)
+    return None
+
+
+class SearchError(Exception):
+    """
+    GitHub kept failing on a query of the repository search
+    """
+
+
+def count(partition, headers):
+    """
+    Number of repositories in a partition, retrying (up to MAX_FAILURES times) 502/504
+    responses, bodies that are not JSON and errors left after the scheduler's own retries
+    :raise SearchError: if every attempt failed
+    """
+    request = {
+        'query': COUNT_QUERY,
+        'variables': {'filter': partition_filter(partition)}
+    }
+    for attempt in range(MAX_FAILURES):
+        response = scheduler.post(GRAPHQL_URL, json=request, headers=headers)
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+        if response.status_code == 200 and 'errors' not in result and (result.get('data') or {}).get('search'):
+            return result['data']['search']['repositoryCount']
+        error = result.get('errors') or f'http code {response.status_code} reason {response.reason}'
+        print(f'Count of {request["variables"]["filter"]} failed ({error}), attempt {attempt + 1} of {MAX_FAILURES}.')
+        metrics.inc('collector_errors_total', collector='search', status=response.status_code)
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+    raise SearchError(f'Could not count {request["variables"]["filter"]}: {error}')
+
+
+def plan(headers, min_stars=MIN_STARS, max_stars=MAX_STARS, last_activity=LAST_ACTIVITY):
+    """
+    Cuts the search space into disjoint star/pushed intervals with at most MAX_RESULTS
+    repositories each, probing only repositoryCount (1 point per probe)
+    :return: list of (partition, repository count) tuples
+    """
+    today = datetime.date.today()
+    partitions = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        root = (max(1, min_stars), max_stars, today - datetime.timedelta(days=last_activity), today)
+        pending = {executor.submit(count, root, headers): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                partition = pending.pop(future)
+                repository_count = future.result()
+                halves = split_partition(partition) if repository_count > MAX_RESULTS else None
+                metrics.event('partition', filter=partition_filter(partition), count=repository_count, split=bool(halves))
+                if halves:
+                    metrics.inc('query_splits_total', collector='search')
+                    for half in halves:
+                        pending[executor.submit(count, half, headers)] = half
+                elif repository_count:
+                    if repository_count > MAX_RESULTS:
+                        print(f'Partition {partition_filter(partition)} cannot be split and has {repository_count} repositories.')
+                    partitions.append((partition, repository_count))
+    partitions.sort(key=lambda p: (p[0][0], p[0][2]))
+    print(f'Planned {len(partitions)} partitions with {sum(c for _, c in partitions)} repositories.')
+    return partitions
 
 
 def process(some_repositories, all_repositories):
@@ -82,102 +194,93 @@ def process(some_repositories, all_repositories):
         all_repositories[repo['owner'] + '/' + repo['name']] = repo
 
 
-def main():
-    all_repositories = dict()
-    os.environ['GITHUB_TOKEN'] = ''
-    token = os.getenv('GITHUB_TOKEN')
-    if not token:
-        print(
-            'Please, set the GITHUB_TOKEN environment variable with your OAuth token (https://help.github.com/en/articles/creating-a-personal-access-token-for-the-command-line)')
-        exit(1)
-    headers = {
-        'Authorization': f'bearer {token}'
+def crawl(partition, repository_count, query, headers):
+    """
+    Retrieves all repositories of a partition, following its own cursor
+    :return: dict with the repositories found, keyed by owner/name
+    """
+    repositories = dict()
+    controller = page_size.controller('search', initial=1, maximum=100, max_cost=MAX_COST)
+    failures = 0  # consecutive errors with the smallest page
+
+    variables = {
+        'filter': partition_filter(partition),
+        'repositoriesPerPage': controller.page_size(),  # from 1 to 100
+        'cursor': None
     }
 
-    # AIMD parameters for auto-tuning the page size
-    ai = 8  # slow start: 1, 2, 4, 8 (max)
-    md = 0.5
+    request = {
+        'query': query,
+        'variables': variables
+    }
 
-    STARS = list(range(1000, 100, -200))
-    for i in STARS:
-        MIN_STARS = i
-        MAX_STARS = None
-        stars = MIN_STARS
+    has_next_page = True
+    while has_next_page:
+        variables['repositoriesPerPage'] = controller.page_size()
+        response = scheduler.post(GRAPHQL_URL, json=request, headers=headers)
+        result = None
+        if response.status_code in (502, 504):  # GitHub gave up on a page too large
+            print(f'Failed with http code {response.status_code} reason {response.reason}.')
+            if variables['repositoriesPerPage'] <= controller.minimum:
+                failures += 1
+            controller.failure(variables['repositoriesPerPage'], reason=f'http_{response.status_code}')
+        else:
+            try:
+                result = response.json()
+            except ValueError:
+                print(f'Failed with http code {response.status_code} reason {response.reason}.')
+                failures += 1
+        if result is None:
+            if failures >= MAX_FAILURES:
+                print(f'Giving up on partition {variables["filter"]} after {failures} failures, '
+                      f'with {len(repositories)} of {repository_count} repositories.')
+                metrics.event('partition_abandoned', collector='search', filter=variables['filter'],
+                              repositories=len(repositories), status=response.status_code)
+                break
+            continue
 
-        variables = {
-            'filter': query_filter(MIN_STARS, MAX_STARS, last_activity=120),
-            'repositoriesPerPage': 1,  # from 1 to 100
-            'cursor': None
-        }
+        if 'errors' in result:
+            if 'timeout' in result['errors'][0]['message']:  # reached timeout
+                print(f'Timeout!', end=' ')
+                controller.failure(variables['repositoriesPerPage'])
+            else:  # some unexpected error.
+                pprint(result['errors'])
+                raise SearchError(f'Search of {variables["filter"]} failed: {result["errors"][0].get("message")}')
+
+        if 'data' in result and result['data']:
+            failures = 0
+            process(result['data']['search']['nodes'], repositories)
+            metrics.inc('repositories_total', len(result['data']['search']['nodes']), collector='search')
+            print(f'Processed {len(repositories)} of {repository_count} repositories ({variables["filter"]}) at {datetime.datetime.now():%H:%M:%S}.')
+
+            cost = (result['data'].get('rateLimit') or {}).get('cost')
+            controller.success(variables['repositoriesPerPage'], response.elapsed.total_seconds(), cost)
+            page_info = result['data']['search']['pageInfo']
+            variables['cursor'] = page_info['endCursor']
+            has_next_page = page_info['hasNextPage']
 
-        request = {
-            'query': open('src/query.graphql', 'r').read(),
-            'variables': variables
-        }
+    return repositories
 
-        print(f"\n\n\n ######### RUNNING MIN_STARS {MIN_STARS} - MAX_STARS {MAX_STARS}")
-        try:
-            repository_count = -1
-            has_next_page = True
-            while has_next_page:
-                print(f'Trying to retrieve the next {variables["repositoriesPerPage"]} repositories (> {stars} stars)...')
-                response = requests.post(url="https://api.github.com/graphql", json=request, headers=headers)
-                try:
-                    result = response.json()
-                except:
-                    print(f'Failed with http code {response.status_code} reason {response.reason}.')
-                    continue
-
-                if 'Retry-After' in response.headers:  # reached retry limit
-                    print(f'Waiting for {response.headers["Retry-After"]} seconds before continuing...', end=' ')
-                    time.sleep(int(response.headers['Retry-After']))
-
-                if 'errors' in result:
-                    if 'timeout' in result['errors'][0]['message']:  # reached timeout
-                        print(f'Timeout!', end=' ')
-                        variables['repositoriesPerPage'] = int(max(1, variables['repositoriesPerPage'] * md))  # using AIMD
-                        ai = 1  # resetting slow start
-                    else:  # some unexpected error.
-                        pprint(result['errors'])
-                        exit(1)
-
-                if 'data' in result and result['data']:
-                    if repository_count == -1:
-                        repository_count = result["data"]["search"]["repositoryCount"]
-
-                    some_repositories = result['data']['search']['nodes']
-                    process(some_repositories, all_repositories)
-                    print(
-                        f'Processed {len(all_repositories)} of {repository_count} repositories at {datetime.datetime.now():%H:%M:%S}.',
-                        end=' ')
-
-                    # Keeps the number of stars already processed to restart the process when reaching 1,000 repositories limit
-                    if some_repositories:
-                        stars = some_repositories[-1]['stargazers']
-
-                    page_info = result['data']['search']['pageInfo']
-                    variables['cursor'] = page_info['endCursor']
-                    variables['repositoriesPerPage'] = min(100, variables['repositoriesPerPage'] + ai)  # using AIMD
-                    ai = min(8, ai * 2)  # slow start
-
-                    if not page_info['hasNextPage']:  # We may have finished all repositories or reached the 1,000 limit
-                        if result["data"]["search"]["repositoryCount"] > 1000:  # We reached the 1,000 repositories limit
-                            print(f'We reached the limit of 1,000 repositories.', end=' ')
-                            variables['filter'] = query_filter(stars - 10, MAX_STARS)  # some overlap to accommodate changes in stars
-                            variables['cursor'] = None
-                        else:  # We have finished all repositories
-                            print(f'Finished.')
-                            has_next_page = False
-
-                time.sleep(1)  # Wait 1 second before next request (https://docs.github.com/en/graphql/overview/rate-limits-and-node-limits-for-the-graphql-api)
-        except:
-            print(response)
-            save(all_repositories)
-            time.sleep(60)
-            continue
-            #breakpoint()
-        finally:
-            save(all_repositories)
+
+def main():
+    if not scheduler.has_tokens():
+        print(
+            'Please, set the GITHUB_TOKENS (or GITHUB_TOKEN) environment variable with your OAuth tokens (https://help.github.com/en/articles/creating-a-personal-access-token-for-the-command-line)')
+        exit(1)
+    headers = dict()  # the scheduler adds the token with the most headroom to each request
+
+    query = load_query()
+
+    partitions = plan(headers)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(crawl, partition, repository_count, query, headers)
+                       for partition, repository_count in partitions]
+            for finished, future in enumerate(as_completed(futures), start=1):
+                checkpoint(future.result())
+                print(f'Finished {finished} of {len(partitions)} partitions.')
+    finally:
+        save()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,21 @@
-import time
-import requests
 import csv
+import json
+import os
 
-from util import REPOS_BY_CODE
+from membership import MembershipIndex
+from util import REPOS_BY_CODE, REPOS_BY_CODE_MEMBERSHIP, REPOS_BY_CODE_PENDING
 
-def save(dict, filename):
+def save(index, filename):
+    """
+    Writes one row per repository with the first of its search strings (in the order of
+    LIST_OF_SEARCH_STRINGS); every match is in REPOS_BY_CODE_MEMBERSHIP
+    """
     with open(filename, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerow(["repository", "search_string"])
 
-        for key in dict.keys():
-            writer.writerow([key, dict[key]['search_string']])
+        for repository in index.keys:
+            writer.writerow([repository, index.first_search_string(repository)])
 """
 Prompt utilizado para gerar a lista:
 
@@ -57,48 +62,64 @@ LIST_OF_SEARCH_STRINGS = [
     'extension:nicescript'                               # NICE RPA
 ]
 
-import requests
-import time
+import code_search
+import store
 
-GITHUB_TOKEN = ""
-PER_PAGE = 100
-MAX_PAGES = 100
-
-headers = {
-    "Authorization": f"token {GITHUB_TOKEN}",
+# Tokens vêm de GITHUB_TOKENS (ou GITHUB_TOKEN); o scheduler escolhe um por requisição
+HEADERS = {
     "Accept": "application/vnd.github.v3+json"
 }
 
-repositories = {}
-
-for string in LIST_OF_SEARCH_STRINGS:
-    for page in range(1, MAX_PAGES + 1):
-        print(f"Página {page}: {string}")
-
-        url = f"https://api.github.com/search/code?q={string}&per_page={PER_PAGE}&page={page}"
-
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 403:
-            print("Rate limit atingido. Aguardando 60 segundos...")
-            time.sleep(60)
-            continue
-
-        data = response.json()
-        items = data.get("items", [])
-        
-        if not items:
-            print("Sem mais resultados.")
-            break
 
+def load_pending():
+    """
+    Buscas abandonadas pela última execução (None se ela terminou tudo)
+    """
+    if not (os.path.exists(REPOS_BY_CODE_PENDING) and os.path.exists(REPOS_BY_CODE_MEMBERSHIP)):
+        return None
+    with open(REPOS_BY_CODE_PENDING, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_pending(abandoned):
+    if not abandoned:
+        if os.path.exists(REPOS_BY_CODE_PENDING):
+            os.remove(REPOS_BY_CODE_PENDING)
+        return
+    with open(REPOS_BY_CODE_PENDING + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(abandoned, file, ensure_ascii=False, indent=1)
+    os.replace(REPOS_BY_CODE_PENDING + '.tmp', REPOS_BY_CODE_PENDING)
+    print(f"{len(abandoned)} buscas abandonadas salvas em {REPOS_BY_CODE_PENDING}; execute de novo para retomá-las.")
+
+
+def main():
+    # Só a chave owner/nome de cada resultado é guardada, com um bit por string de busca
+    pending = load_pending()
+    if pending:  # retoma a execução anterior: só as buscas abandonadas são refeitas
+        print(f"Retomando {len(pending)} buscas abandonadas de {REPOS_BY_CODE_PENDING}...")
+        repositories = MembershipIndex.load(REPOS_BY_CODE_MEMBERSHIP, LIST_OF_SEARCH_STRINGS)
+    else:
+        repositories = MembershipIndex(LIST_OF_SEARCH_STRINGS)
+
+    abandoned = []
+    for string, items in code_search.crawl(LIST_OF_SEARCH_STRINGS, HEADERS, resume=pending, abandoned=abandoned):
         for item in items:
             repo_data = item['repository']
-            repo_data['search_string'] = string
-            repo_key = f"{repo_data['owner']['login']}/{repo_data['name']}"
-            repositories[repo_key] = repo_data
+            repositories.add(f"{repo_data['owner']['login']}/{repo_data['name']}", string)
+
+    print(f"\nTotal de repositórios únicos encontrados: {len(repositories)}\n")
+
+    database = store.default()
+    database.replace("by_code", ({"repository": repository, "search_string": repositories.first_search_string(repository)}
+                                 for repository in repositories.keys))
+    database.replace("by_code_membership", ({"repository": repository, "search_string": search_string}
+                                            for repository, search_string in repositories.pairs()))
 
-        time.sleep(1)
+    save(repositories, REPOS_BY_CODE)
+    repositories.save(REPOS_BY_CODE_MEMBERSHIP)
+    save_pending(abandoned)
+    return repositories
 
-print(f"\nTotal de repositórios únicos encontrados: {len(repositories)}\n")
 
-save(repositories, REPOS_BY_CODE)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,366 @@
-import pandas as pd
-import requests
-import time
-from itertools import islice
-from util import REPOS_BY_CODE, REPOS_DETAILS
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-# GitHub token pessoal (necessário para GraphQL)
-
-GITHUB_TOKEN = ""
+import http_cache
+import metrics
+import page_size
+import scheduler
+import store
+from util import GRAPHQL_URL, REPOS_DETAILS_LOG
 
+# GraphQL exige autenticação: os tokens vêm de GITHUB_TOKENS (ou GITHUB_TOKEN) e o
+# scheduler escolhe, a cada requisição, o que tem mais orçamento sobrando
 HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
     "Accept": "application/vnd.github.v4+json"
 }
 
-def load_by_code():
-    repositories = dict()
-    print(f'Loading repositories from {REPOS_BY_CODE}...', end=' ')
-    try:
-        df = pd.read_csv(REPOS_BY_CODE, keep_default_na=False)
-        for i, row in df.iterrows():
-            repo = row.to_dict()
-            repositories[repo['repository']] = repo
-        print('Done!')
-    except IOError:
-        print('Failed!')
-    return repositories
+# Repositórios por documento GraphQL (cada um vira um alias r0, r1, ...) na primeira execução;
+# depois o tamanho é ajustado pelo page_size.PageSizeController e lembrado entre execuções
+BATCH_SIZE = 25
+MAX_BATCH_SIZE = 100
+
+# Pontos GraphQL que um lote pode custar (de 5.000 por hora de cada token); lotes mais caros diminuem o tamanho
+MAX_COST = 10
+
+# Documentos GraphQL enviados ao mesmo tempo
+MAX_WORKERS = 4
+
+# Segundos em que a resposta de um lote é reaproveitada do cache sem consultar o GitHub
+CACHE_MAX_AGE = 24 * 60 * 60
+
+# Repositórios por consulta de pushedAt no modo incremental (só campos escalares, custo 1)
+PROBE_BATCH_SIZE = 100
+
+PROBE_FIELDS = "nameWithOwner pushedAt"
+
+# Marca, em probe_pushed, os repositórios que o GitHub não encontrou (apagados, renomeados, privados)
+NOT_FOUND = "NOT_FOUND"
+
+REPOSITORY_FIELDS = """
+fragment RepositoryFields on Repository {
+  nameWithOwner
+  createdAt
+  pushedAt
+  isMirror
+  diskUsage
+  description
+  primaryLanguage { name }
+  contributors: mentionableUsers { totalCount }
+  languages(first: 10) {
+    nodes { name }
+  }
+  watchers { totalCount }
+  stargazers { totalCount }
+  forks { totalCount }
+  issues { totalCount }
+  defaultBranchRef {
+    target {
+      ... on Commit {
+        history(first: 0) { totalCount }
+      }
+    }
+  }
+  pullRequests { totalCount }
+  branches: refs(refPrefix: "refs/heads/") { totalCount }
+  tags: refs(refPrefix: "refs/tags/") { totalCount }
+  releases { totalCount }
+}
+"""
 
-def build_query(owner, name):
+def build_batch_query(batch, selection="...RepositoryFields", fragments=REPOSITORY_FIELDS):
+    """
+    Builds one GraphQL document that fetches several repositories using aliases
+    :param batch: list of (owner, name) tuples
+    :param selection: fields selected from each repository
+    :param fragments: fragment definitions used by selection
+    :return: request payload where alias rN refers to batch[N]
+    """
+    fields = [
+        f'r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ {selection} }}'
+        for i, (owner, name) in enumerate(batch)
+    ]
     return {
-        "query": f"""
-        {{
-          repository(owner: "{owner}", name: "{name}") {{
-            nameWithOwner
-            createdAt
-            pushedAt
-            isMirror
-            diskUsage
-            description
-            primaryLanguage {{ name }}
-            contributors: mentionableUsers {{ totalCount }}
-            languages(first: 10) {{
-              nodes {{ name }}
-            }}
-            watchers {{ totalCount }}
-            stargazers {{ totalCount }}
-            forks {{ totalCount }}
-            issues {{ totalCount }}
-            defaultBranchRef {{
-              target {{
-                ... on Commit {{
-                  history(first: 0) {{ totalCount }}
-                }}
-              }}
-            }}
-            pullRequests {{ totalCount }}
-            branches: refs(refPrefix: "refs/heads/") {{ totalCount }}
-            tags: refs(refPrefix: "refs/tags/") {{ totalCount }}
-            releases {{ totalCount }}
-          }}
-        }}
-        """
+        "query": "{\n" + "\n".join(fields) + "\nrateLimit { cost remaining resetAt }\n}\n" + fragments
     }
 
-def fetch_repo_data(owner, name):
-    print(f"Fetching {owner}/{name}...   ")
+class BatchError(Exception):
+    """
+    GraphQL answered 200 but without data for the batch as a whole (timeout, rate limit...)
+    """
+
+
+def alias_index(error, batch):
+    """
+    Position in batch of the repository an error refers to (None if it refers to the whole document)
+    """
+    alias = (error.get("path") or ["?"])[0]
+    if isinstance(alias, str) and alias.startswith("r") and alias[1:].isdigit() and int(alias[1:]) < len(batch):
+        return int(alias[1:])
+    return None
+
+def fetch_batch(batch, max_age=CACHE_MAX_AGE):
+    """
+    Fetches a batch of repositories in a single GraphQL request.
+    Repositories that fail come back as None, and the ones GitHub does not find as
+    NOT_FOUND, without affecting the others; if the whole request fails (including a 200
+    without data or with an error outside the aliases), the batch is split in half and retried.
+    :param batch: list of (owner, name) tuples
+    :param max_age: seconds a cached response is reused without asking GitHub (0 always fetches it again,
+        since GraphQL responses carry no ETag to revalidate)
+    :return: list with the repository data (or None, or NOT_FOUND) in the same order as batch
+    """
+    controller = batch_controller()
     try:
-        response = requests.post(
-            "https://api.github.com/graphql",
+        query = build_batch_query(batch)
+        response = http_cache.post(
+            GRAPHQL_URL,
             headers=HEADERS,
-            json=build_query(owner, name)
+            json=query,
+            max_age=max_age
         )
         response.raise_for_status()
-        data = response.json()
-        print("Done!\n")
-        return data["data"]["repository"]
+        result = response.json()
+        if "errors" in result:  # não reaproveita respostas parciais
+            http_cache.invalidate("POST", GRAPHQL_URL, headers=HEADERS, json=query)
+        if result.get("data") is None:
+            raise BatchError(((result.get("errors") or [{}])[0]).get("message") or "resposta sem dados")
+        for error in result.get("errors", []):
+            if alias_index(error, batch) is None:
+                raise BatchError(error.get("message") or error.get("type"))
+        if not getattr(response, "from_cache", False):
+            cost = ((result.get("data") or {}).get("rateLimit") or {}).get("cost")
+            controller.success(len(batch), response.elapsed.total_seconds(), cost)
     except Exception as e:
+        metrics.event("batch_error", collector="details", size=len(batch), error=repr(e))
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        if status in (502, 504) or "timeout" in str(e).lower():  # lote grande demais para o GitHub
+            controller.failure(len(batch), reason=f"http_{status}" if status else "timeout")
+        elif isinstance(e, BatchError):
+            controller.failure(len(batch), reason="graphql_error")
+        if len(batch) > 1:
+            metrics.inc("query_splits_total", collector="details")
+            middle = len(batch) // 2
+            return fetch_batch(batch[:middle], max_age) + fetch_batch(batch[middle:], max_age)
+        owner, name = batch[0]
         print(f"Erro em {owner}/{name}: {e}")
-        return None
+        metrics.inc("collector_errors_total", collector="details")
+        return [None]
+
+    data = result["data"]
+    not_found = set()
+    for error in result.get("errors", []):
+        index = alias_index(error, batch)
+        owner, name = batch[index]
+        print(f"Erro em {owner}/{name}: {error.get('message')}")
+        metrics.inc("collector_errors_total", collector="details", type=error.get("type"))
+        if error.get("type") == "NOT_FOUND":
+            not_found.add(index)
+    return [NOT_FOUND if i in not_found else data.get(f"r{i}") for i in range(len(batch))]
+
+def probe_pushed(batch):
+    """
+    Fetches only pushedAt of a batch of repositories (always from GitHub, never from
+    the cache); if the whole request fails, the batch is split in half and retried.
+    :param batch: list of (owner, name) tuples
+    :return: list in the same order as batch with pushedAt, NOT_FOUND, or None when unknown
+    """
+    try:
+        response = scheduler.post(GRAPHQL_URL, headers=HEADERS, json=build_batch_query(batch, PROBE_FIELDS, ""))
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            return probe_pushed(batch[:middle]) + probe_pushed(batch[middle:])
+        owner, name = batch[0]
+        print(f"Erro em {owner}/{name}: {e}")
+        return [None]
+
+    data = result.get("data") or {}
+    not_found = {
+        (error.get("path") or ["?"])[0] for error in result.get("errors", []) if error.get("type") == "NOT_FOUND"
+    }
+    return [
+        NOT_FOUND if f"r{i}" in not_found else (data.get(f"r{i}") or {}).get("pushedAt")
+        for i in range(len(batch))
+    ]
+
+def plan_refresh(full_names, previous):
+    """
+    Compares pushedAt of each repository on GitHub with the row collected before
+    :param full_names: repositories to check (owner/name)
+    :param previous: rows of the last run, keyed by owner/name
+    :return: (repositories to fetch again, repositories unchanged, repositories not found)
+    """
+    known = [full_name for full_name in full_names if full_name in previous]
+    batches = [known[i:i + PROBE_BATCH_SIZE] for i in range(0, len(known), PROBE_BATCH_SIZE)]
+    print(f"Probing pushedAt of {len(known)} repositories in {len(batches)} queries...")
+    changed = [full_name for full_name in full_names if full_name not in previous]  # novos
+    unchanged, missing = [], []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        probes = executor.map(lambda batch: probe_pushed([tuple(f.split("/", 1)) for f in batch]), batches)
+        for batch, pushed in zip(batches, probes):
+            for full_name, pushed_at in zip(batch, pushed):
+                if pushed_at == NOT_FOUND:
+                    missing.append(full_name)
+                elif pushed_at and pushed_at == previous[full_name]["pushedAt"]:
+                    unchanged.append(full_name)
+                else:  # alterado, ou sem resposta do probe
+                    changed.append(full_name)
+    print(f"{len(changed)} new or changed, {len(unchanged)} unchanged, {len(missing)} not found.")
+    metrics.event("refresh_plan", collector="details", changed=len(changed), unchanged=len(unchanged), missing=len(missing))
+    return changed, unchanged, missing
+
+def batch_controller():
+    return page_size.controller("details", initial=BATCH_SIZE, maximum=MAX_BATCH_SIZE, max_cost=MAX_COST)
+
+def fetch_repo_data(owner, name):
+    print(f"Fetching {owner}/{name}...   ")
+    data = fetch_batch([(owner, name)])[0]
+    return None if data == NOT_FOUND else data
+
+def to_row(data, search_string):
+    return {
+        "repository": data.get("nameWithOwner"),
+        "createdAt": data.get("createdAt"),
+        "pushedAt": data.get("pushedAt"),
+        "isMirror": data.get("isMirror"),
+        "diskUsage": data.get("diskUsage"),
+        "description": data.get("description"),
+        "contributors": data["contributors"]["totalCount"],
+        "primaryLanguage": data["primaryLanguage"]["name"] if data.get("primaryLanguage") else None,
+        "languages": ", ".join(lang["name"] for lang in data["languages"]["nodes"]),
+        "watchers": data["watchers"]["totalCount"],
+        "stargazers": data["stargazers"]["totalCount"],
+        "forks": data["forks"]["totalCount"],
+        "issues": data["issues"]["totalCount"],
+        "commits": data["defaultBranchRef"]["target"]["history"]["totalCount"]
+            if data.get("defaultBranchRef") else None,
+        "pullRequests": data["pullRequests"]["totalCount"],
+        "branches": data["branches"]["totalCount"],
+        "tags": data["tags"]["totalCount"],  # tags usa o mesmo campo sem paginação
+        "releases": data["releases"]["totalCount"],
+        "search_string": search_string
+    }
     
+def load_checkpoint():
+    """
+    Reads the checkpoint log written by append_checkpoint
+    :return: dict mapping owner/name to the row already fetched for it
+    """
+    done = dict()
+    print(f'Loading checkpoint from {REPOS_DETAILS_LOG}...', end=' ')
+    try:
+        with open(REPOS_DETAILS_LOG, 'r', encoding='utf-8') as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # last line cut short by a crash
+                    continue
+                done[record["key"]] = record["row"]
+        print(f'{len(done)} repositories already fetched.')
+    except IOError:
+        print('Not found.')
+    return done
+
+def append_checkpoint(log, records):
+    """
+    Appends one JSON line per fetched repository and forces it to disk
+    :param log: checkpoint log opened in append mode
+    :param records: list of (owner/name, row) tuples
+    """
+    for key, row in records:
+        log.write(json.dumps({"key": key, "row": row}, ensure_ascii=False) + "\n")
+    log.flush()
+    os.fsync(log.fileno())
+    
+def load_previous():
+    """
+    Reads the rows saved by the last run from the store
+    :return: dict mapping owner/name to its row
+    """
+    return store.default().load("details")
+
 def save(results):
-    df = pd.DataFrame(results)
-    df.to_csv(REPOS_DETAILS, index=False)
+    """
+    Replaces the details table with the rows of this run (dropping repositories no longer
+    found by code search) and exports it to REPOS_DETAILS
+    """
+    database = store.default()
+    database.replace("details", results)
+    database.export("details")
     print(f"Dados salvos com {len(results)}")
 
 
-def main():
-    repos = load_by_code()  # CSV no estilo owner/repo
-    first_five = dict(islice(repos.items(), 100))
-    results = []
-
-    i = 0
-    for full_name in repos.keys():
-        if i == 50:
-            save(results)
-            i = 0
-
-        if "/" not in full_name:
-            continue
-        owner, name = full_name.split("/")
-        data = fetch_repo_data(owner, name)
-        if data:
-            row = {
-                "repository": data.get("nameWithOwner"),
-                "createdAt": data.get("createdAt"),
-                "pushedAt": data.get("pushedAt"),
-                "isMirror": data.get("isMirror"),
-                "diskUsage": data.get("diskUsage"),
-                "description": data.get("description"),
-                "contributors": data["contributors"]["totalCount"],
-                "primaryLanguage": data["primaryLanguage"]["name"] if data.get("primaryLanguage") else None,
-                "languages": ", ".join(lang["name"] for lang in data["languages"]["nodes"]),
-                "watchers": data["watchers"]["totalCount"],
-                "stargazers": data["stargazers"]["totalCount"],
-                "forks": data["forks"]["totalCount"],
-                "issues": data["issues"]["totalCount"],
-                "commits": data["defaultBranchRef"]["target"]["history"]["totalCount"]
-                    if data.get("defaultBranchRef") else None,
-                "pullRequests": data["pullRequests"]["totalCount"],
-                "branches": data["branches"]["totalCount"],
-                "tags": data["tags"]["totalCount"],  # tags usa o mesmo campo sem paginação
-                "releases": data["releases"]["totalCount"],
-                "search_string": repos[full_name]["search_string"]
-            }
-            results.append(row)
-        i += 1
-        time.sleep(1)  # Evita limite de rate
+def main(incremental=False):
+    """
+    Fetches the details of every repository found by code search
+    :param incremental: if True, only repositories whose pushedAt changed since the last
+        run (or that are new) are fetched again; the other rows are carried forward
+    """
+    from loaders import load_by_code  # pandas só é carregado por quem coleta de fato
+
+    repos = load_by_code(['search_string'])  # CSV no estilo owner/repo
+    full_names = [full_name for full_name in repos.keys() if "/" in full_name]
+    done = load_checkpoint()
+    pending = [full_name for full_name in full_names if full_name not in done]
+    carried = dict()
+    previous = load_previous() if incremental else dict()
+    if previous:
+        pending, unchanged, _ = plan_refresh(pending, previous)
+        for full_name in unchanged:
+            carried[full_name] = dict(previous[full_name], search_string=repos[full_name]["search_string"])
+    pending = iter(pending)
+    controller = batch_controller()
+    failed = []  # sem resposta nesta execução: o log é mantido para tentar de novo
+    # No modo incremental, pending só tem repositórios novos ou alterados desde a última execução: uma
+    # resposta ainda em cache estaria desatualizada, então eles são sempre buscados de novo (respostas
+    # GraphQL não têm ETag, não há 304: cada repositório alterado custa uma consulta completa)
+    max_age = 0 if previous else CACHE_MAX_AGE
+
+    def fetch(batch):
+        print(f"Fetching {batch[0]} ... {batch[-1]} ({len(batch)} repositórios)")
+        return fetch_batch([tuple(full_name.split("/", 1)) for full_name in batch], max_age)
+
+    with open(REPOS_DETAILS_LOG, 'a', encoding='utf-8') as log, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {}
+
+        def submit():
+            batch = list(itertools.islice(pending, controller.page_size()))  # tamanho atual do lote
+            if batch:
+                futures[executor.submit(fetch, batch)] = batch
+
+        for _ in range(MAX_WORKERS):
+            submit()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = futures.pop(future)
+                records = [
+                    (full_name, to_row(data, repos[full_name]["search_string"]))
+                    for full_name, data in zip(batch, future.result()) if data and data != NOT_FOUND
+                ]
+                for full_name, data in zip(batch, future.result()):
+                    if data is None:
+                        failed.append(full_name)
+                        if full_name in previous:  # falhou agora: mantém a linha anterior
+                            carried[full_name] = dict(previous[full_name], search_string=repos[full_name]["search_string"])
+                append_checkpoint(log, records)
+                store.default().upsert("details", [row for _, row in records])
+                done.update(records)
+                metrics.inc("repositories_total", len(records), collector="details")
+                print(f"Processed {len(done)} of {len(full_names)} repositories.")
+                submit()
 
     # Salvar no CSV
-    save(results)
+    save([done.get(full_name) or carried[full_name] for full_name in full_names if full_name in done or full_name in carried])
+    if failed:  # a próxima execução retoma do log e busca só estes
+        print(f"{len(failed)} repositories could not be fetched; run again to retry them ({REPOS_DETAILS_LOG} kept).")
+    else:
+        os.remove(REPOS_DETAILS_LOG)  # o CSV já tem tudo; o log só serve para retomar uma execução interrompida
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(incremental="--incremental" in sys.argv[1:])
@@ -0,0 +1,68 @@
+# Lista de extensões e nomes típicos de arquivos de configuração
+PADROES_CONFIG = [
+    '.env', '.ini', '.cfg', '.config', '.conf',
+    '.yaml', '.yml', '.json', 'settings.xml',
+    'config.json', 'config.yaml', 'settings.py',
+    'config.yml', 'docker-compose.yml'
+]
+
+# Pastas consideradas "organizadoras de configuração"
+PASTAS_CONFIG = ('config/', 'configs/', 'settings/', 'env/', 'environments/')
+
+SEM_EXTENSAO = '[sem_extensao]'
+
+
+def extensao(nome):
+    """
+    Extensão de um nome de arquivo, com a mesma regra de os.path.splitext
+    (pontos no início do nome não contam: '.env' não tem extensão)
+    """
+    sem_pontos = nome.lstrip('.')
+    i = sem_pontos.rfind('.')
+    return sem_pontos[i:] if i >= 0 else ''
+
+
+class ClassificadorConfig:
+    """
+    Classifica caminhos de arquivos como arquivos de configuração comparando o nome
+    do arquivo (e não qualquer trecho do caminho) com um índice pré-calculado:
+
+    - extensões ('.json' casa 'a/b.json', mas não 'package.json.bak');
+    - nomes exatos ('settings.py', '.env');
+    - variações de dotfiles ('.env.local', '.env.example', mas não '.envrc').
+    """
+
+    def __init__(self, padroes=PADROES_CONFIG, pastas=PASTAS_CONFIG):
+        padroes = [padrao.lower() for padrao in padroes]
+        self.extensoes = frozenset(padrao for padrao in padroes if padrao.startswith('.'))
+        self.nomes = frozenset(padroes)
+        self.prefixos = tuple(padrao + '.' for padrao in self.extensoes)
+        self.pastas = tuple(pasta.lower() for pasta in pastas)
+
+    def e_config(self, caminho):
+        nome = caminho.rpartition('/')[2].lower()
+        return nome in self.nomes or extensao(nome) in self.extensoes or nome.startswith(self.prefixos)
+
+    def classificar(self, caminhos):
+        """
+        Classifica uma lista de caminhos de uma só vez.
+
+        Parâmetros:
+            caminhos (Iterable[str]): caminhos de arquivos no repositório
+
+        Retorna:
+            List[tuple]: (caminho, extensão, em_pasta_config) de cada arquivo de configuração;
+            a extensão é '[sem_extensao]' quando o arquivo não tem uma
+        """
+        nomes, extensoes, prefixos, pastas = self.nomes, self.extensoes, self.prefixos, self.pastas
+        resultado = []
+        for caminho in caminhos:
+            minusculo = caminho.lower()
+            nome = minusculo.rpartition('/')[2]
+            ext = extensao(nome)
+            if nome in nomes or ext in extensoes or nome.startswith(prefixos):
+                resultado.append((caminho, ext or SEM_EXTENSAO, minusculo.startswith(pastas)))
+        return resultado
+
+
+CLASSIFICADOR = ClassificadorConfig()
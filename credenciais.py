@@ -0,0 +1,84 @@
+import re
+
+# Arquivos maiores que isso não são analisados (dumps, fixtures, lockfiles gigantes)
+TAMANHO_MAXIMO = 1024 * 1024
+
+# Padrões de credenciais; cada um vira um grupo nomeado de uma única expressão regular
+PADROES_CREDENCIAIS = {
+    'chave_privada': r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY(?: BLOCK)?-----',
+    'aws_access_key': r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b',
+    'github_token': r'\b(?:gh[pousr]_[A-Za-z0-9]{36,}|github_pat_[A-Za-z0-9_]{60,})\b',
+    'slack_token': r'\bxox[abposr]-[A-Za-z0-9-]{10,}',
+    'google_api_key': r'\bAIza[0-9A-Za-z_-]{35}\b',
+    'stripe_key': r'\b[sr]k_live_[0-9A-Za-z]{20,}\b',
+    'url_com_senha': r'\b[a-z][a-z0-9+.-]*://[^\s:/@\'"]+:[^\s:/@\'"$<{%]{3,}@[^\s/\'"]+',
+    'atribuicao_segredo': (
+        r'(?i:\b[\w.-]*(?:password|passwd|pwd|secret(?:[_-]?key)?|api[_-]?key|access[_-]?key|auth[_-]?token'
+        r'|private[_-]?key|token)\b'
+        r'[\'"]?\s*[:=]\s*[\'"]?'
+        r'(?![\'"]|\$|\{|<|%|\s|none\b|null\b|true\b|false\b|changeme\b|your[_-]|xxx'
+        r'|\w+(?:\.\w+)*\s*[(\[]|(?:os\.)?environ\b|process\.env\.)'  # chamadas e leituras do ambiente
+        r'(?P<valor>[^\s\'",;#]{8,}))'
+    ),
+}
+
+PADRAO_CREDENCIAIS = re.compile('|'.join(f'(?P<{nome}>{padrao})' for nome, padrao in PADROES_CREDENCIAIS.items()))
+
+# Padrões específicos, usados para dar nome ao valor de uma atribuição genérica (ex: token: ghp_...)
+PADRAO_ESPECIFICO = re.compile('|'.join(
+    f'(?P<{nome}>{padrao})' for nome, padrao in PADROES_CREDENCIAIS.items() if nome != 'atribuicao_segredo'
+))
+
+
+def mascarar(trecho):
+    """
+    Mantém só o início do segredo encontrado, para que o relatório não o exponha
+    """
+    return trecho[:4] + '*' * min(len(trecho) - 4, 8) if len(trecho) > 4 else '*' * len(trecho)
+
+
+def escanear_texto(texto):
+    """
+    Procura todos os padrões de credenciais em uma única passada pelo texto.
+
+    Parâmetros:
+        texto (str): conteúdo do arquivo
+
+    Retorna:
+        List[tuple]: (regra, número da linha, trecho mascarado) de cada ocorrência
+    """
+    achados = []
+    linha = 1
+    posicao = 0
+    for ocorrencia in PADRAO_CREDENCIAIS.finditer(texto):
+        linha += texto.count('\n', posicao, ocorrencia.start())
+        posicao = ocorrencia.start()
+        regra = ocorrencia.lastgroup
+        trecho = ocorrencia.group()
+        if ocorrencia.group('valor'):  # atribuição: mascara só o valor
+            regra = 'atribuicao_segredo'
+            especifico = PADRAO_ESPECIFICO.search(ocorrencia.group('valor'))
+            if especifico:
+                regra = especifico.lastgroup
+            trecho = trecho[:ocorrencia.start('valor') - ocorrencia.start()] + mascarar(ocorrencia.group('valor'))
+        else:
+            trecho = mascarar(trecho)
+        achados.append((regra, linha, trecho))
+    return achados
+
+
+def escanear_bytes(conteudo):
+    """
+    Igual a escanear_texto, ignorando arquivos binários ou grandes demais
+    """
+    if len(conteudo) > TAMANHO_MAXIMO or b'\0' in conteudo[:8000]:
+        return []
+    return escanear_texto(conteudo.decode('utf-8', errors='replace'))
+
+
+def escanear_arquivo(caminho):
+    """
+    Escaneia um arquivo em disco (usado pelos processos do pool)
+    """
+    with open(caminho, 'rb') as arquivo:
+        return escanear_bytes(arquivo.read(TAMANHO_MAXIMO + 1))
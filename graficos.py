@@ -0,0 +1,242 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+
+def finalizar(fig, mostrar):
+    """
+    Exibe a figura (notebook) ou só a devolve, para ser salva por relatorio.py
+    """
+    if mostrar:
+        plt.show()
+    return fig
+
+
+def plotar_correlacao_vida_contributors(df, vida_col='vida', contributors_col='contributors', mostrar=True):
+    """
+    Gera um gráfico de dispersão entre 'vida' (meses) e 'contributors' (int),
+    com linha de tendência e estatísticas de correlação.
+
+    Parâmetros:
+    - df: DataFrame do Pandas.
+    - vida_col: Nome da coluna com tempo em meses (default: 'vida').
+    - contributors_col: Nome da coluna com número de contribuidores (default: 'contributors').
+    - mostrar: Se False, não exibe a figura (para salvar a figura devolvida).
+    """
+
+    # Contagens ausentes (<NA>) ficam de fora da regressão
+    df = df[[vida_col, contributors_col]].dropna().astype(float)
+
+    # Configurações do gráfico
+    fig = plt.figure(figsize=(10, 6))
+    plt.scatter(
+        x=df[vida_col],
+        y=df[contributors_col],
+        color='blue',
+        alpha=0.6,
+        edgecolors='w',
+        s=100  # Tamanho dos pontos
+    )
+
+    # Linha de tendência (regressão linear)
+    z = np.polyfit(df[vida_col], df[contributors_col], 1)
+    p = np.poly1d(z)
+    plt.plot(
+        df[vida_col],
+        p(df[vida_col]),
+        color='red',
+        linestyle='--',
+        label=f'Tendência: y = {z[0]:.2f}x + {z[1]:.2f}'
+    )
+
+    # Cálculo da correlação de Pearson
+    corr = df[[vida_col, contributors_col]].corr().iloc[0, 1]
+
+    # Títulos e labels
+    plt.title(f'Correlação entre Tempo de Vida (meses) e Número de Contribuidores\nCorrelação de Pearson: {corr:.2f}', pad=20)
+    plt.xlabel('Tempo de Vida (meses)')
+    plt.ylabel('Número de Contribuidores')
+    plt.grid(alpha=0.3)
+    plt.legend()
+
+    # Ajustes finais
+    plt.tight_layout()
+    return finalizar(fig, mostrar)
+
+
+def plot_linguagens_mais_usadas(df, top_n=10, mostrar=True):
+    """
+    Gera um gráfico de barras com as linguagens mais usadas nos repositórios.
+
+    Parâmetros:
+        df (pd.DataFrame): DataFrame contendo a coluna 'primaryLanguage'
+        top_n (int): número de linguagens mais frequentes a exibir (default: 10)
+        mostrar (bool): se False, não exibe a figura (default: True)
+
+    Retorno:
+        Figure (exibida se mostrar for True)
+    """
+    # Contar as linguagens mais usadas
+    contagem = df['primaryLanguage'].dropna().value_counts().head(top_n)
+
+    # Criar o gráfico
+    fig = plt.figure(figsize=(10, 6))
+    bars = plt.bar(contagem.index, contagem.values, color='mediumseagreen', edgecolor='black')
+
+    # Título e eixos
+    plt.title(f"Top {top_n} Linguagens Mais Usadas")
+    plt.xlabel("Linguagem")
+    plt.ylabel("Número de Repositórios")
+    plt.xticks(rotation=45)
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Adicionar os rótulos numéricos nas barras
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2, height + 0.5, f'{int(height)}',
+                 ha='center', va='bottom', fontsize=9)
+
+    plt.tight_layout()
+    return finalizar(fig, mostrar)
+
+
+def plot_top_repos_mais_estrelas(df, top_n=10, mostrar=True):
+    """
+    Gera um gráfico de barras horizontal com os repositórios com mais estrelas.
+    Exibe a linguagem ao lado do nome do repositório.
+
+    Parâmetros:
+        df (pd.DataFrame): DataFrame com colunas 'repository', 'primaryLanguage' e 'stargazers'
+        top_n (int): número de repositórios a exibir (default: 10)
+        mostrar (bool): se False, não exibe a figura (default: True)
+
+    Retorno:
+        Figure (exibida se mostrar for True)
+    """
+    # Trabalha com uma cópia para não acrescentar colunas ao DataFrame recebido
+    df = df[['repository', 'primaryLanguage', 'stargazers']].copy()
+
+    # Garantir que 'stargazers' é numérico
+    df['stargazers'] = pd.to_numeric(df['stargazers'], errors='coerce').fillna(0)
+
+    # Criar coluna de rótulo: nome (linguagem)
+    df['repositorio'] = df.apply(
+        lambda row: f"{row['repository']} ({row['primaryLanguage']})" if pd.notna(row['primaryLanguage']) else row['repository'],
+        axis=1
+    )
+
+    # Ordenar e pegar os top N
+    top_repos = df[['repositorio', 'stargazers']].sort_values(by='stargazers', ascending=False).head(top_n)
+
+    # Plotar gráfico horizontal
+    fig = plt.figure(figsize=(10, 6))
+    bars = plt.barh(top_repos['repositorio'], top_repos['stargazers'], color='cornflowerblue', edgecolor='black')
+    plt.xlabel("Número de Estrelas")
+    plt.title(f"Top {top_n} Repositórios com Mais Estrelas")
+    plt.gca().invert_yaxis()  # Repositórios mais estrelados no topo
+    plt.grid(axis='x', linestyle='--', alpha=0.7)
+
+    # Adicionar os valores ao lado das barras
+    for bar in bars:
+        width = bar.get_width()
+        plt.text(width + 5, bar.get_y() + bar.get_height()/2, f'{int(width)}', va='center', fontsize=9)
+
+    plt.tight_layout()
+    return finalizar(fig, mostrar)
+
+
+def plotar_rosquinha_extensoes(df, coluna_extensao, titulo='Distribuição de Extensões', cores=None, sombra=True, explode=0.01, mostrar=True):
+    """
+    Cria um gráfico tipo rosquinha (donut) mostrando a distribuição de extensões de arquivos.
+
+    Parâmetros:
+    df (pd.DataFrame): DataFrame contendo os dados
+    coluna_extensao (str): Nome da coluna com as extensões de arquivo
+    titulo (str): Título do gráfico (opcional)
+    cores (list): Lista de cores para as fatias (opcional)
+    sombra (bool): Se True, adiciona sombra ao gráfico (opcional)
+    explode (float): Valor para separar as fatias (0 para nenhuma separação)
+    mostrar (bool): Se False, não exibe a figura (para salvar a figura devolvida)
+    """
+
+    # Verifica se a coluna existe no DataFrame
+    if coluna_extensao not in df.columns:
+        raise ValueError(f"A coluna '{coluna_extensao}' deve existir no DataFrame")
+
+    # Calcula a contagem de cada extensão
+    contagem_extensoes = df[coluna_extensao].value_counts().reset_index()
+    contagem_extensoes.columns = ['Extensao', 'Quantidade']
+
+    # Se houver muitas extensões, agrupa as menos frequentes em "Outros"
+    if len(contagem_extensoes) > 10:
+        top_extensoes = contagem_extensoes.head(9)
+        outras = pd.DataFrame({
+            'Extensao': ['Outros'],
+            'Quantidade': [contagem_extensoes['Quantidade'][9:].sum()]
+        })
+        contagem_extensoes = pd.concat([top_extensoes, outras])
+
+    # Configuração do gráfico
+    fig, ax = plt.subplots(figsize=(10, 8))
+
+    # Cria o gráfico de rosquinha
+    wedges, texts, autotexts = ax.pie(
+        contagem_extensoes['Quantidade'],
+        labels=contagem_extensoes['Extensao'],
+        autopct=lambda p: '{:.1f}%\n({:.0f})'.format(p, p * sum(contagem_extensoes['Quantidade']) / 100),
+        startangle=90,
+        colors=cores,
+        shadow=sombra,
+        explode=[explode] * len(contagem_extensoes),
+        wedgeprops={'width': 0.4, 'edgecolor': 'white'},
+        textprops={'fontsize': 9}
+    )
+
+    # Ajusta o estilo dos textos - Versão com alinhamento modificado
+    plt.setp(autotexts, size=8, weight="bold", color='black',
+        horizontalalignment='left', verticalalignment='center')
+    plt.setp(texts, size=9, horizontalalignment='center', verticalalignment='center')
+
+    # Adiciona título e legenda
+    ax.set_title(titulo, pad=20, fontsize=14, fontweight='bold')
+    plt.legend(
+        wedges,
+        contagem_extensoes['Extensao'],
+        title="Extensões",
+        loc="center left",
+        bbox_to_anchor=(1, 0, 0.5, 1))
+
+    # Garante que o gráfico seja desenhado como círculo
+    ax.axis('equal')
+
+    # Mostra o gráfico
+    plt.tight_layout()
+    return finalizar(fig, mostrar)
+
+
+def plot_pizza_coluna_booleana(df, coluna, titulo="Distribuição booleana", mostrar=True):
+    """
+    Gera um gráfico de pizza para uma coluna booleana de um DataFrame.
+
+    Parâmetros:
+        df (pd.DataFrame): DataFrame contendo a coluna booleana
+        coluna (str): nome da coluna booleana
+        titulo (str): título do gráfico (opcional)
+        mostrar (bool): se False, não exibe a figura (default: True)
+
+    Retorno:
+        Figure (exibida se mostrar for True)
+    """
+    # Contar valores True e False
+    contagem = df[coluna].value_counts().sort_index()
+
+    # Criar rótulos amigáveis
+    labels = ['Não utilizam', 'Utilizam']
+    valores = [contagem.get(False, 0), contagem.get(True, 0)]
+
+    # Plotar
+    fig = plt.figure(figsize=(6, 6))
+    plt.pie(valores, labels=labels, autopct='%1.1f%%', colors=['lightcoral', 'mediumseagreen'], startangle=90)
+    plt.title(titulo)
+    plt.axis('equal')  # Mantém o círculo redondo
+    return finalizar(fig, mostrar)
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+import scheduler
+from util import HTTP_CACHE_DIR
+
+# Maximum size of the cache on disk (least recently used entries are evicted first)
+MAX_CACHE_SIZE = 1024 * 1024 * 1024
+
+# Bytes read at a time when a streamed body is copied to the cache
+CHUNK_SIZE = 64 * 1024
+
+# Response headers kept with each entry
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class DiskBudget:
+    """
+    Keeps a cache directory under max_size bytes, evicting the least recently used
+    files (oldest mtime) first. Callers report the bytes they add or remove with
+    account and refresh the mtime of the files they reuse with touch.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = None  # bytes on disk, computed on first use
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):  # still being written
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def touch(self, path):
+        now = time.time()
+        os.utime(path, (now, now))
+
+    def account(self, delta):
+        """
+        Tracks the size of the cache and evicts least recently used files when it
+        grows beyond max_size
+        """
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, _, size in self.entries())
+            else:
+                self.size += delta
+            if self.size <= self.max_size:
+                return
+            target = self.max_size * 0.9  # evict some extra room to avoid evicting on every store
+            for path, _, size in sorted(self.entries(), key=lambda entry: entry[1]):
+                if self.size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self.size -= size
+                except OSError:
+                    pass
+
+
+class HttpCache:
+    """
+    Persistent cache of GitHub API responses keyed by method, URL, Accept header and
+    request body.
+
+    Entries are revalidated with If-None-Match/If-Modified-Since, so an unchanged
+    resource costs a 304 Not Modified (which does not count against the rate limit)
+    instead of a full download. Responses without validators (e.g. GraphQL) are only
+    reused while younger than the max_age given by the caller. The cache is bounded
+    to max_size bytes with least recently used eviction.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_size=MAX_CACHE_SIZE, send=scheduler.request):
+        self.directory = directory
+        self.max_size = max_size
+        self.send = send
+        self.budget = DiskBudget(directory, max_size)
+
+    def key(self, method, url, headers=None, params=None, json_body=None):
+        accept = (headers or {}).get('Accept', '')
+        payload = json.dumps([method.upper(), url, accept, params, json_body], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.json', base + '.body'
+
+    def load(self, key):
+        meta_path, body_path = self.paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        except (IOError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        return meta
+
+    def response(self, key, meta, url, stream=False):
+        """
+        Rebuilds a requests.Response from a cache entry and marks it as recently used
+        :param stream: if True the body is read lazily from disk (iter_content)
+        """
+        meta_path, body_path = self.paths(key)
+        for path in (meta_path, body_path):
+            self.budget.touch(path)
+        response = requests.Response()
+        response.status_code = meta['status']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.url = url
+        response.encoding = 'utf-8'
+        response.from_cache = True
+        if stream:
+            response.raw = open(body_path, 'rb')
+        else:
+            with open(body_path, 'rb') as file:
+                response._content = file.read()
+            response._content_consumed = True
+        return response
+
+    def store(self, key, response, stream=False):
+        """
+        Writes a response to the cache; a streamed body is copied to disk in chunks
+        """
+        meta_path, body_path = self.paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            'status': response.status_code,
+            'headers': {h: response.headers[h] for h in STORED_HEADERS if h in response.headers},
+            'stored': time.time()
+        }
+        previous = sum(os.path.getsize(p) for p in (meta_path, body_path) if os.path.exists(p))
+        with open(body_path + '.tmp', 'wb') as file:
+            for chunk in response.iter_content(CHUNK_SIZE) if stream else [response.content]:
+                file.write(chunk)
+        os.replace(body_path + '.tmp', body_path)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + '.tmp', meta_path)
+        self.account(os.path.getsize(meta_path) + os.path.getsize(body_path) - previous)
+
+    def touch(self, key, meta):
+        meta['stored'] = time.time()
+        meta_path, _ = self.paths(key)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def invalidate(self, method, url, headers=None, params=None, json=None):
+        for path in self.paths(self.key(method, url, headers, params, json)):
+            if os.path.exists(path):
+                self.account(-os.path.getsize(path))
+                os.remove(path)
+
+    def account(self, delta):
+        self.budget.account(delta)
+
+    def request(self, method, url, headers=None, params=None, json=None, max_age=0, **kwargs):
+        """
+        Sends a request, answering it from the cache whenever possible
+        :param max_age: seconds an entry is reused without asking GitHub (0 always revalidates)
+        :param stream: (keyword) bodies are written to and read from disk without being held in memory
+        :return: requests.Response (from_cache is True when the body came from the cache)
+        """
+        key = self.key(method, url, headers, params, json)
+        stream = kwargs.get('stream', False)
+        meta = self.load(key)
+        if meta and max_age and time.time() - meta['stored'] < max_age:
+            metrics.inc('http_cache_total', result='hit')
+            return self.response(key, meta, url, stream)
+
+        headers = dict(headers or {})
+        if meta:
+            if 'ETag' in meta['headers']:
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if 'Last-Modified' in meta['headers']:
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self.send(method, url, headers=headers, params=params, json=json, **kwargs)
+        if response.status_code == 304 and meta:
+            metrics.inc('http_cache_total', result='revalidated')
+            self.touch(key, meta)
+            return self.response(key, meta, url, stream)
+        metrics.inc('http_cache_total', result='miss')
+        if response.status_code == 200 and (max_age or 'ETag' in response.headers or 'Last-Modified' in response.headers):
+            self.store(key, response, stream)
+            if stream:
+                return self.response(key, self.load(key), url, stream)
+        return response
+
+
+_default = HttpCache()
+
+
+def request(method, url, **kwargs):
+    return _default.request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return _default.request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return _default.request('POST', url, **kwargs)
+
+
+def invalidate(method, url, **kwargs):
+    _default.invalidate(method, url, **kwargs)
@@ -0,0 +1,86 @@
+import pandas as pd
+
+from util import REPOS_BY_CODE
+
+COUNT = 'Int64'  # nullable integer, missing counts stay <NA> instead of turning the column into float
+
+BY_CODE_DTYPES = {
+    'repository': str,
+    'search_string': str,
+}
+
+DETAILS_DTYPES = {
+    'repository': str,
+    'isMirror': 'boolean',
+    'diskUsage': COUNT,
+    'description': str,
+    'contributors': COUNT,
+    'primaryLanguage': str,
+    'languages': str,
+    'watchers': COUNT,
+    'stargazers': COUNT,
+    'forks': COUNT,
+    'issues': COUNT,
+    'commits': COUNT,
+    'pullRequests': COUNT,
+    'branches': COUNT,
+    'tags': COUNT,
+    'releases': COUNT,
+    'search_string': str,
+}
+
+DATES = ['createdAt', 'pushedAt']
+
+
+def normalize_dates(df, columns=DATES):
+    """
+    Converts date columns to timezone-naive UTC datetimes (unparseable values become NaT)
+    """
+    for column in columns:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], utc=True, errors='coerce').dt.tz_localize(None)
+    return df
+
+
+def read_table(filename, dtypes, columns=None):
+    """
+    Reads a CSV produced by the collectors with explicit dtypes and parsed dates
+    :param filename: CSV file
+    :param dtypes: dtype of each known column
+    :param columns: columns to read (None reads all of them)
+    :return: DataFrame
+    """
+    header = pd.read_csv(filename, nrows=0).columns
+    if columns is not None:
+        header = [column for column in header if column in columns]
+    df = pd.read_csv(
+        filename,
+        usecols=header,
+        dtype={column: dtype for column, dtype in dtypes.items() if column in header},
+        keep_default_na=False,
+        na_values={column: [''] for column, dtype in dtypes.items() if dtype is not str and column in header},
+    )
+    return normalize_dates(df, [column for column in DATES if column in header])
+
+
+def to_records(df, keys):
+    """
+    Turns a DataFrame into a dict of rows keyed by owner/name (later rows win)
+    :param df: DataFrame
+    :param keys: Series with the key of each row
+    """
+    df = df.set_index(keys.rename(None))
+    df = df[~df.index.duplicated(keep='last')]
+    return df.to_dict('index')
+
+
+def load_by_code(columns=None):
+    repositories = dict()
+    print(f'Loading repositories from {REPOS_BY_CODE}...', end=' ')
+    try:
+        df = read_table(REPOS_BY_CODE, BY_CODE_DTYPES, columns and {'repository', *columns})
+        repositories = to_records(df, df['repository'])
+        print('Done!')
+    except IOError:
+        print('Failed!')
+    return repositories
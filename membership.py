@@ -0,0 +1,92 @@
+import csv
+import sys
+
+
+class MembershipIndex:
+    """
+    Which search strings matched which repositories, without keeping the search API
+    objects around.
+
+    Each repository key (owner/name) is interned once and gets an integer id; its
+    memberships are a bitmap (int) over the search strings.
+    """
+
+    def __init__(self, search_strings):
+        self.search_strings = list(dict.fromkeys(search_strings))
+        self.positions = {search_string: i for i, search_string in enumerate(self.search_strings)}
+        self.ids = {}  # repository key -> id
+        self.keys = []  # id -> repository key
+        self.masks = []  # id -> bitmap over search strings
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, repository):
+        return repository in self.ids
+
+    def position(self, search_string):
+        if search_string not in self.positions:
+            self.positions[search_string] = len(self.search_strings)
+            self.search_strings.append(search_string)
+        return self.positions[search_string]
+
+    def add(self, repository, search_string):
+        """
+        Records that search_string matched repository (repeated calls are harmless)
+        """
+        position = self.position(search_string)
+        repository_id = self.ids.get(repository)
+        if repository_id is None:
+            repository = sys.intern(repository)
+            repository_id = self.ids[repository] = len(self.keys)
+            self.keys.append(repository)
+            self.masks.append(0)
+        self.masks[repository_id] |= 1 << position
+
+    def first_search_string(self, repository):
+        """
+        :return: the first search string (in the order they were given) that matched the repository
+        """
+        mask = self.masks[self.ids[repository]]
+        return self.search_strings[(mask & -mask).bit_length() - 1]
+
+    def pairs(self):
+        """
+        Iterates over the full many-to-many membership as (repository, search string) tuples
+        """
+        for repository, mask in zip(self.keys, self.masks):
+            for i in iterate_bits(mask):
+                yield repository, self.search_strings[i]
+
+    def save(self, filename):
+        """
+        Writes one (repository, search_string) row per membership
+        """
+        with open(filename, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['repository', 'search_string'])
+            writer.writerows(self.pairs())
+
+    @classmethod
+    def load(cls, filename, search_strings=()):
+        """
+        Reads a file written by save (or the one row per repository REPOS_BY_CODE)
+        :param search_strings: known search strings, fixes the bit order
+        """
+        index = cls(search_strings)
+        with open(filename, mode='r', newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                index.add(row['repository'], row['search_string'])
+        return index
+
+
+def iterate_bits(bitmap):
+    """
+    Positions of the bits set in an int, in increasing order (linear in the number of
+    bits, unlike clearing the lowest bit of a large int one at a time)
+    """
+    bits = bin(bitmap)[:1:-1]  # least significant bit first
+    position = bits.find('1')
+    while position >= 0:
+        yield position
+        position = bits.find('1', position + 1)
@@ -0,0 +1,203 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+from util import METRICS_EVENTS, METRICS_FILE
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Seconds between rewrites of the Prometheus text file
+EXPORT_INTERVAL = 15
+
+# Prefix of every exported metric name
+PREFIX = 'rpa_'
+
+# Help text of the exported metrics
+DESCRIPTIONS = {
+    'requests_total': 'HTTP requests sent to GitHub, by rate limit resource and status',
+    'request_duration_seconds': 'Latency of the HTTP requests sent to GitHub',
+    'response_bytes_total': 'Bytes received from GitHub',
+    'retries_total': 'Requests retried after a rate limit response, by reason',
+    'request_errors_total': 'Requests that failed without a response (timeouts, connection errors)',
+    'rate_limit_remaining': 'Remaining budget of each rate limit resource',
+    'rate_limit_reset_timestamp': 'Epoch when each rate limit resource resets',
+    'scheduler_wait_seconds_total': 'Time spent waiting for a rate limit slot',
+    'http_cache_total': 'Requests answered by the HTTP cache (hit, revalidated) or sent to GitHub (miss)',
+    'graphql_timeouts_total': 'GraphQL queries that timed out',
+    'page_size': 'Current page (or batch) size chosen by the adaptive controllers',
+    'page_size_changes_total': 'Page size changes, by collector and direction',
+    'repositories_total': 'Repositories collected, by collector',
+    'search_results_total': 'Code search results received',
+    'downloads_total': 'Blobs and tarballs needed by the scans, downloaded or found in the local cache',
+    'download_bytes_total': 'Bytes of blobs and tarballs written to the local cache',
+    'collector_errors_total': 'Repositories or queries that failed, by collector',
+    'query_splits_total': 'Queries split (1,000 results cap, failed batches, truncated trees), by collector',
+}
+
+
+def metric_key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms shared by the collectors, exported as:
+
+    - a JSONL event stream (one line per request, retry, page size change...) that
+      can be replayed to see where the time of a long run went;
+    - a Prometheus text format file, rewritten every export_interval seconds and at
+      exit, for a local scraper (e.g. node_exporter's textfile collector).
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, events_file=METRICS_EVENTS, prometheus_file=METRICS_FILE, export_interval=EXPORT_INTERVAL):
+        self.events_file = events_file
+        self.prometheus_file = prometheus_file
+        self.export_interval = export_interval
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.types = {}  # metric name -> counter, gauge or histogram
+        self.values = {}  # (name, labels) -> value of counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.buckets = {}  # histogram name -> bucket upper bounds
+        self.log = None
+        self.exported = time.time()
+
+    def register(self, name, kind):
+        self.types.setdefault(name, kind)
+
+    def inc(self, name, value=1, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.register(name, 'counter')
+            self.values[key] = self.values.get(key, 0) + value
+        self.maybe_export()
+
+    def gauge(self, name, value, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.register(name, 'gauge')
+            self.values[key] = value
+        self.maybe_export()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.register(name, 'histogram')
+            self.buckets.setdefault(name, buckets)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets[name]), 0.0, 0]
+            index = bisect.bisect_left(self.buckets[name], value)
+            if index < len(histogram[0]):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        self.maybe_export()
+
+    def event(self, kind, **fields):
+        """
+        Appends one event to the JSONL stream
+        """
+        line = json.dumps(dict({'time': round(time.time(), 3), 'event': kind}, **fields), default=str)
+        with self.lock:
+            if self.log is None:
+                os.makedirs(os.path.dirname(self.events_file), exist_ok=True)
+                self.log = open(self.events_file, 'a', encoding='utf-8', buffering=1)
+            self.log.write(line + '\n')
+
+    def value(self, name, **labels):
+        return self.values.get(metric_key(name, labels), 0)
+
+    def render(self):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self.lock:
+            for name, kind in sorted(self.types.items()):
+                metric = PREFIX + name
+                if name in DESCRIPTIONS:
+                    lines.append(f'# HELP {metric} {DESCRIPTIONS[name]}')
+                lines.append(f'# TYPE {metric} {kind}')
+                if kind != 'histogram':
+                    for (key, labels), value in sorted(self.values.items()):
+                        if key == name:
+                            lines.append(f'{metric}{format_labels(labels)} {value}')
+                    continue
+                for (key, labels), (counts, total, count) in sorted(self.histograms.items()):
+                    if key != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket in zip(self.buckets[name], counts):
+                        cumulative += bucket
+                        lines.append(f'{metric}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{metric}_bucket{format_labels(labels, [("le", "+Inf")])} {count}')
+                    lines.append(f'{metric}_sum{format_labels(labels)} {total}')
+                    lines.append(f'{metric}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """
+        Rewrites the Prometheus file atomically, so a scraper never reads half of it
+        """
+        self.exported = time.time()
+        if not self.types:
+            return
+        with self.export_lock:
+            os.makedirs(os.path.dirname(self.prometheus_file), exist_ok=True)
+            with open(self.prometheus_file + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(self.render())
+            os.replace(self.prometheus_file + '.tmp', self.prometheus_file)
+
+    def maybe_export(self):
+        with self.lock:
+            due = time.time() - self.exported >= self.export_interval
+            if due:
+                self.exported = time.time()
+        if due:
+            self.export()
+
+    def close(self):
+        self.export()
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+
+
+_default = Metrics()
+atexit.register(_default.close)
+
+
+def inc(name, value=1, **labels):
+    _default.inc(name, value, **labels)
+
+
+def gauge(name, value, **labels):
+    _default.gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    _default.observe(name, value, **labels)
+
+
+def event(kind, **fields):
+    _default.event(kind, **fields)
+
+
+def export():
+    _default.export()
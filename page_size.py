@@ -0,0 +1,166 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+import metrics
+from util import PAGE_SIZE_STATE
+
+# Seconds a page (or batch) should take; larger responses shrink the page size
+TARGET_LATENCY = 5.0
+
+# Factor applied to the page size after a timeout (multiplicative decrease)
+DECREASE = 0.5
+
+# Largest increase of the page size after each response under the target (additive increase)
+INCREASE = 8
+
+# Weight of the newest sample in the moving average of seconds per item
+ALPHA = 0.3
+
+# Minimum seconds between writes of the learned state
+SAVE_INTERVAL = 30
+
+
+class PageSizeController:
+    """
+    Chooses how many items (repositories, search results...) to ask for in each page
+    or batch, using AIMD with slow start, as TCP does with its congestion window:
+
+    - below the slow start threshold the size doubles after every successful page;
+    - above it, the size grows by at most INCREASE items per page;
+    - a timeout halves the size and lowers the threshold to it.
+
+    Instead of waiting for timeouts, the controller also keeps a moving average of the
+    seconds per item and never grows past the size expected to answer in target_latency
+    seconds (or past max_cost GraphQL points); slow responses shrink it proportionally.
+
+    The learned size, threshold and seconds per item are saved to PAGE_SIZE_STATE, so
+    the next partition and the next run start where the previous one stopped. Safe to
+    share between threads.
+    """
+
+    def __init__(self, name, initial, minimum=1, maximum=100, target_latency=TARGET_LATENCY, max_cost=None, state=None):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_cost = max_cost
+        self.lock = threading.Lock()
+        state = state or {}
+        self.size = self.clamp(state.get('size', initial))
+        self.threshold = self.clamp(state.get('threshold', maximum))
+        self.rate = state.get('rate')  # seconds per item
+
+    def clamp(self, size):
+        return int(min(self.maximum, max(self.minimum, size)))
+
+    def state(self):
+        return {'size': self.size, 'threshold': self.threshold, 'rate': self.rate}
+
+    def page_size(self):
+        return self.size
+
+    def success(self, size, elapsed=None, cost=None):
+        """
+        Adjusts the page size after a successful page
+        :param size: number of items asked for in that page
+        :param elapsed: seconds the response took (None or 0 if unknown, e.g. from cache)
+        :param cost: GraphQL cost of the query, if known
+        """
+        with self.lock:
+            previous = self.size
+            if elapsed and size:
+                sample = elapsed / size
+                self.rate = sample if self.rate is None else (1 - ALPHA) * self.rate + ALPHA * sample
+
+            factor = 1
+            if elapsed and elapsed > self.target_latency:
+                factor = self.target_latency / elapsed
+            if self.max_cost and cost and cost > self.max_cost:
+                factor = min(factor, self.max_cost / cost)
+            if factor < 1:  # over budget: shrink proportionally
+                self.size = self.clamp(size * factor)
+                self.threshold = self.size
+            elif size >= self.size:  # ignores late answers of pages asked before the last change
+                if self.size < self.threshold:
+                    self.size = min(self.size * 2, self.threshold)
+                else:
+                    self.size += INCREASE
+                if self.rate:
+                    self.size = min(self.size, int(self.target_latency / self.rate))
+                self.size = self.clamp(self.size)
+            reason = 'slow' if factor < 1 else 'success'
+        self.changed(previous, reason)
+
+    def failure(self, size=None, reason='timeout'):
+        """
+        Halves the page size after a timeout (or another error caused by a large page)
+        :param size: number of items asked for in the failed page (default: current size)
+        """
+        with self.lock:
+            previous = self.size
+            self.size = self.clamp(min(self.size, size or self.size) * DECREASE)
+            self.threshold = self.size
+        metrics.inc('graphql_timeouts_total' if reason == 'timeout' else 'collector_errors_total', collector=self.name)
+        self.changed(previous, reason)
+
+    def changed(self, previous, reason):
+        metrics.gauge('page_size', self.size, collector=self.name)
+        if self.size == previous:
+            return
+        metrics.inc('page_size_changes_total', collector=self.name, direction='up' if self.size > previous else 'down')
+        metrics.event('page_size', collector=self.name, previous=previous, page_size=self.size,
+                      threshold=self.threshold, rate=self.rate, reason=reason)
+        _store.save(force=reason != 'success')
+
+
+class ControllerStore:
+    """
+    Shared controllers, persisted together in one JSON file
+    """
+
+    def __init__(self, filename=PAGE_SIZE_STATE):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.controllers = {}
+        self.saved = 0
+        try:
+            with open(filename, 'r', encoding='utf-8') as file:
+                self.state = json.load(file)
+        except (IOError, ValueError):
+            self.state = {}
+
+    def controller(self, name, initial, **kwargs):
+        with self.lock:
+            if name not in self.controllers:
+                self.controllers[name] = PageSizeController(name, initial, state=self.state.get(name), **kwargs)
+            return self.controllers[name]
+
+    def save(self, force=True):
+        with self.lock:
+            if not self.controllers or (not force and time.time() - self.saved < SAVE_INTERVAL):
+                return
+            self.saved = time.time()
+            self.state.update({name: controller.state() for name, controller in self.controllers.items()})
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(self.filename + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(self.state, file, indent=2)
+            os.replace(self.filename + '.tmp', self.filename)
+
+
+_store = ControllerStore()
+atexit.register(_store.save)
+
+
+def controller(name, initial, **kwargs):
+    """
+    Controller shared by every caller using the same name, restored from the last run
+    :param initial: page size used when nothing was learned yet
+    """
+    return _store.controller(name, initial, **kwargs)
+
+
+def save():
+    _store.save()
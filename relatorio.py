@@ -0,0 +1,232 @@
+"""
+Gera os gráficos da análise sem notebook, para várias combinações de estrelas e meses.
+
+Cada gráfico é desenhado com o backend Agg num processo separado e salvo em PNG/SVG em
+REPORT_DIR/<estrelas>estrelas_<meses>meses/; um resumo por combinação vai para
+REPORT_DIR/resumo.csv. Gráficos cujos dados de entrada não mudaram desde a última
+execução (mesmo hash) não são desenhados de novo.
+
+Uso: python relatorio.py [--stars 100 250] [--months 12 24] [--config df_config.csv]
+                         [--formatos png svg] [--workers 4] [--forcar]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import analise
+from util import CONFIG_FILES, REPORT_DIR, REPOS_DETAILS
+
+FORMATOS = ('png', 'svg')
+
+# Resolução dos PNGs
+DPI = 120
+
+# Hash dos dados de cada gráfico já gerado, para pular os que não mudaram
+MANIFESTO = 'manifesto.json'
+
+# Código que desenha os gráficos: uma mudança nele também invalida os já gerados
+GRAFICOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'graficos.py')
+
+
+def iniciar_processo():
+    # Precisa vir antes de qualquer import de matplotlib.pyplot no processo
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def desenhar(tarefa):
+    """
+    Desenha um gráfico (num processo do pool) e salva um arquivo por formato
+    :param tarefa: (função de graficos.py, DataFrame, kwargs, caminho sem extensão, formatos)
+    :return: arquivos gravados
+    """
+    import matplotlib.pyplot as plt
+    import graficos
+
+    funcao, df, kwargs, caminho, formatos = tarefa
+    fig = getattr(graficos, funcao)(df, mostrar=False, **kwargs)
+    arquivos = []
+    try:
+        for formato in formatos:
+            arquivos.append(f'{caminho}.{formato}')
+            fig.savefig(arquivos[-1], dpi=DPI, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return arquivos
+
+
+@functools.lru_cache()
+def versao_graficos():
+    """
+    Hash do código de graficos.py (lido como texto: o processo principal não importa o matplotlib)
+    """
+    with open(GRAFICOS, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def hash_entrada(funcao, df, kwargs, formatos):
+    """
+    Identifica os dados e parâmetros de um gráfico (colunas, tipos e valores) e a versão
+    do código que o desenha
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([versao_graficos(), DPI, funcao, kwargs, list(formatos), list(df.columns),
+                         [str(t) for t in df.dtypes]], sort_keys=True, default=str).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def carregar_config(arquivo):
+    """
+    Lê o inventário de arquivos de configuração salvo do df_config do notebook
+    (colunas 'repositorio', 'arquivo', 'extensao' e 'em_pasta_config')
+    """
+    df = pd.read_csv(arquivo, dtype={'repositorio': str, 'arquivo': str, 'extensao': str})
+    df['em_pasta_config'] = df['em_pasta_config'].astype(bool)
+    return df
+
+
+def graficos_combinacao(stars, months, df_filter, df_timeline, df_config=None):
+    """
+    :return: lista de (nome, função de graficos.py, DataFrame com só as colunas usadas, kwargs,
+        colunas que precisam de ao menos uma linha preenchida para haver gráfico)
+    """
+    tarefas = [
+        ('linguagens', 'plot_linguagens_mais_usadas', df_filter[['primaryLanguage']], {'top_n': 10},
+         ['primaryLanguage']),
+        ('top_repos', 'plot_top_repos_mais_estrelas', df_filter[['repository', 'primaryLanguage', 'stargazers']],
+         {'top_n': 10}, ['repository']),
+        ('vida_contributors', 'plotar_correlacao_vida_contributors', df_timeline[['vida', 'contributors']], {},
+         ['vida', 'contributors']),
+    ]
+    if df_config is not None:
+        df_config = df_config[df_config['repositorio'].isin(df_filter['repository'])]
+        df_group = analise.extensao_mais_frequente_por_repositorio(df_config).reset_index(drop=True)
+        tarefas.append(('extensoes', 'plotar_rosquinha_extensoes', df_group, {
+            'coluna_extensao': 'extensao_mais_frequente',
+            'titulo': 'Principais Extensões em Arquivos de Configuração por Repositório',
+        }, ['extensao_mais_frequente']))
+        df_pasta = pd.DataFrame(df_config.groupby('repositorio')['em_pasta_config'].any())
+        tarefas.append(('pasta_config', 'plot_pizza_coluna_booleana', df_pasta, {
+            'coluna': 'em_pasta_config',
+            'titulo': 'Proporção de Repositórios que Utilizam um Diretório Dedicado a Arquivos de Configuração',
+        }, ['em_pasta_config']))
+    return tarefas
+
+
+def resumo_combinacao(stars, months, df_filter, df_timeline, df_config=None):
+    linguagens = df_filter['primaryLanguage'].dropna().value_counts()
+    vida = df_timeline[['vida', 'contributors']].dropna().astype(float)
+    linha = {
+        'stars': stars,
+        'months': months,
+        'repositorios': len(df_filter),
+        'estrelas_mediana': df_filter['stargazers'].median(),
+        'contribuidores_mediana': df_filter['contributors'].median(),
+        'vida_mediana_meses': df_timeline['vida'].median(),
+        'linguagem_principal': linguagens.index[0] if len(linguagens) else None,
+        'correlacao_vida_contribuidores': vida['vida'].corr(vida['contributors']) if len(vida) > 1 else None,
+    }
+    if df_config is not None:
+        df_config = df_config[df_config['repositorio'].isin(df_filter['repository'])]
+        linha['com_pasta_config'] = df_config.groupby('repositorio')['em_pasta_config'].any().mean()
+    return linha
+
+
+def ler_manifesto(saida):
+    try:
+        with open(os.path.join(saida, MANIFESTO), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (IOError, ValueError):
+        return dict()
+
+
+def gravar_manifesto(saida, manifesto):
+    arquivo = os.path.join(saida, MANIFESTO)
+    with open(arquivo + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifesto, file, indent=2, sort_keys=True)
+    os.replace(arquivo + '.tmp', arquivo)
+
+
+def gerar(stars_list, months_list, details=REPOS_DETAILS, config=None, formatos=FORMATOS, saida=REPORT_DIR,
+          workers=None, forcar=False):
+    """
+    Gera os gráficos e o resumo de todas as combinações de estrelas e meses
+    :param config: CSV com o inventário de arquivos de configuração (opcional)
+    :param forcar: se True, redesenha mesmo os gráficos cujos dados não mudaram
+    :return: DataFrame com o resumo
+    """
+    df_config = carregar_config(config) if config else None
+    manifesto = dict() if forcar else ler_manifesto(saida)
+    os.makedirs(saida, exist_ok=True)
+
+    resumo = []
+    pendentes = []
+    for stars in stars_list:
+        for months in months_list:
+            df_filter = analise.filtrar(stars, months, arquivo=details)
+            df_timeline = analise.adicionar_coluna_vida(df_filter)
+            resumo.append(resumo_combinacao(stars, months, df_filter, df_timeline, df_config))
+
+            pasta = os.path.join(saida, f'{stars}estrelas_{months}meses')
+            os.makedirs(pasta, exist_ok=True)
+            for nome, funcao, df, kwargs, colunas in graficos_combinacao(stars, months, df_filter, df_timeline,
+                                                                         df_config):
+                caminho = os.path.join(pasta, nome)
+                chave = os.path.relpath(caminho, saida)
+                if df[colunas].dropna().empty:
+                    print(f'{chave}: sem dados.')
+                    continue
+                entrada = hash_entrada(funcao, df, kwargs, formatos)
+                if manifesto.get(chave) == entrada and all(os.path.exists(f'{caminho}.{f}') for f in formatos):
+                    print(f'{chave}: inalterado.')
+                    continue
+                pendentes.append((chave, entrada, (funcao, df, kwargs, caminho, formatos)))
+
+    print(f'Desenhando {len(pendentes)} gráficos...')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=iniciar_processo) as executor:
+            futures = {executor.submit(desenhar, tarefa): (chave, entrada) for chave, entrada, tarefa in pendentes}
+            for future in as_completed(futures):
+                chave, entrada = futures[future]
+                try:
+                    arquivos = future.result()
+                except Exception as e:
+                    print(f'{chave}: erro {e!r}')
+                    continue
+                manifesto[chave] = entrada
+                print(f'{chave}: {", ".join(os.path.basename(arquivo) for arquivo in arquivos)}')
+    finally:
+        gravar_manifesto(saida, manifesto)
+
+    df_resumo = pd.DataFrame(resumo)
+    df_resumo.to_csv(os.path.join(saida, 'resumo.csv'), index=False)
+    return df_resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stars', type=int, nargs='+', default=[250], help='mínimos de estrelas')
+    parser.add_argument('--months', type=int, nargs='+', default=[15], help='meses de atividade recente')
+    parser.add_argument('--details', default=REPOS_DETAILS, help='CSV de detalhes dos repositórios')
+    parser.add_argument('--config', default=CONFIG_FILES if os.path.exists(CONFIG_FILES) else None,
+                        help='CSV com o inventário de arquivos de configuração (padrão: o gravado por cli.py inventory)')
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument('--saida', default=REPORT_DIR, help='diretório dos gráficos e do resumo')
+    parser.add_argument('--workers', type=int, help='processos desenhando ao mesmo tempo (padrão: núcleos)')
+    parser.add_argument('--forcar', action='store_true', help='redesenha também os gráficos inalterados')
+    args = parser.parse_args(argv)
+
+    df_resumo = gerar(args.stars, args.months, args.details, args.config, args.formatos, args.saida,
+                      args.workers, args.forcar)
+    print()
+    print(df_resumo.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import collections
+import datetime
+import os
+import re
+import threading
+import time
+
+import requests
+
+import metrics
+
+# Seconds to wait on a secondary rate limit when GitHub does not send Retry-After
+SECONDARY_BACKOFF = 60
+
+# Attempts per request before giving the (rate limited) response back to the caller
+MAX_RETRIES = 5
+
+# Transient server errors (and connection errors) retried for idempotent requests, waiting
+# SERVER_ERROR_BACKOFF seconds, then twice as long at each new attempt
+SERVER_ERRORS = (500, 502, 503, 504)
+IDEMPOTENT = ('GET', 'HEAD')
+SERVER_ERROR_BACKOFF = 1
+
+# Keep-alive connections per host kept by the shared session (one per concurrent worker)
+POOL_SIZE = 32
+
+# Seconds to connect and to wait for each read of a response (callers may pass their own timeout)
+TIMEOUT = (10, 60)
+
+# Seconds of recent requests used to measure how fast each budget is being spent
+RATE_WINDOW = 60
+
+
+def resource_for(url):
+    """
+    Guesses the rate limit bucket of a GitHub API URL before its response is known
+    :param url: request URL
+    :return: resource name as reported by the X-RateLimit-Resource header
+    """
+    if url.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    if '/search/code' in url:
+        return 'code_search'
+    if '/search/' in url:
+        return 'search'
+    return 'core'
+
+
+def parse_reset(reset_at):
+    """
+    Converts a GraphQL resetAt timestamp (e.g. 2025-06-06T16:22:55Z) to epoch seconds
+    """
+    return datetime.datetime.strptime(reset_at, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def record(method, url, resource, response, elapsed, attempt, retry, stream=False, token=None):
+    """
+    Reports a request to the metrics module (latency, bytes, status, retries)
+    """
+    if 'Content-Length' in response.headers:
+        size = int(response.headers['Content-Length'])
+    else:
+        size = 0 if stream else len(response.content or b'')
+    resource = response.headers.get('X-RateLimit-Resource', resource)
+    metrics.inc('requests_total', resource=resource, status=response.status_code)
+    metrics.observe('request_duration_seconds', elapsed, resource=resource)
+    metrics.inc('response_bytes_total', size, resource=resource)
+    if retry:
+        metrics.inc('retries_total', resource=resource, reason=retry)
+    metrics.event('request', method=method, url=url, resource=resource, status=response.status_code,
+                  elapsed=round(elapsed, 3), bytes=size, attempt=attempt, retry=retry, token=token,
+                  remaining=response.headers.get('X-RateLimit-Remaining'))
+
+
+def tokens_from_env():
+    """
+    Tokens listed in GITHUB_TOKENS (separated by commas or whitespace), or the single
+    GITHUB_TOKEN when GITHUB_TOKENS is not set
+    """
+    tokens = re.split(r'[\s,]+', os.getenv('GITHUB_TOKENS') or os.getenv('GITHUB_TOKEN') or '')
+    return list(dict.fromkeys(token for token in tokens if token))
+
+
+class RateLimitScheduler:
+    """
+    Paces requests so that the budget of each rate limit resource runs out exactly
+    when it resets, instead of sleeping a fixed time between requests. Requests are only
+    paced while the recent spend rate would use up the budget before the reset, and
+    requests that turn out to be free (304 Not Modified, or the remaining budget did not
+    drop) give their slot back.
+
+    The budget is learned from the X-RateLimit-* headers, from the GraphQL
+    rateLimit { cost remaining resetAt } block and from secondary limit responses
+    (403/429 with Retry-After). Safe to share between threads.
+
+    With a pool of tokens, each token has its own budget (and secondary limit) per
+    resource. Requests without an Authorization header are sent with the token that
+    can go first, i.e. the one with the most headroom; exhausted tokens are parked
+    until their window resets, so throughput grows with the number of tokens.
+    """
+
+    def __init__(self, session=None, tokens=None):
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self.tokens = tokens_from_env() if tokens is None else list(tokens)
+        self.lock = threading.Lock()
+        # Budgets are keyed by (resource, token index); the index is None for requests
+        # that bring their own Authorization header
+        self.remaining = {}  # key -> requests (or GraphQL points) left in the window
+        self.reset = {}  # key -> epoch when the window resets
+        self.cost = {}  # key -> cost of the last request
+        self.next_slot = {}  # key -> earliest epoch for the next request
+        self.spent = collections.defaultdict(collections.deque)  # key -> (epoch, cost) of recent requests
+        self.blocked_until = {}  # token index -> epoch; secondary limits apply to every resource
+
+    def start(self, key, now):
+        """
+        Earliest epoch a request could use the budget of key, without reserving it
+        """
+        start = max(now, self.next_slot.get(key, 0), self.blocked_until.get(key[1], 0))
+        if key in self.remaining and self.reset[key] > start and self.remaining[key] < self.cost.get(key, 1):
+            start = self.reset[key] + 1
+        return start
+
+    def spend_rate(self, key, now):
+        """
+        Budget spent per second by the requests of the last RATE_WINDOW seconds
+        """
+        spent = self.spent[key]
+        while spent and spent[0][0] < now - RATE_WINDOW:
+            spent.popleft()
+        return sum(cost for _, cost in spent) / RATE_WINDOW
+
+    def wait(self, resource, tokens=(None,)):
+        """
+        Blocks until the next request to the resource may be sent and reserves its slot
+        :param tokens: indexes of the tokens that may be used (None: the caller's own)
+        :return: (index of the token whose slot was reserved, reservation to pass to release)
+        """
+        with self.lock:
+            now = time.time()
+            token = min(tokens, key=lambda t: (self.start((resource, t), now), -self.remaining.get((resource, t), float('inf'))))
+            key = (resource, token)
+            start = max(now, self.next_slot.get(key, 0), self.blocked_until.get(token, 0))
+            reservation = None
+            if key in self.remaining:
+                reset = self.reset[key]
+                cost = self.cost.get(key, 1)
+                if reset <= start:  # window already reset, budget unknown until next response
+                    del self.remaining[key]
+                elif self.remaining[key] < cost:  # budget exhausted, park the token until reset
+                    start = reset + 1
+                    self.next_slot[key] = start
+                    del self.remaining[key]
+                else:
+                    interval = 0
+                    if self.spend_rate(key, start) * (reset - start) > self.remaining[key]:
+                        # at this pace the budget runs out before the reset: spread it evenly
+                        interval = (reset - start) * cost / self.remaining[key]
+                        self.next_slot[key] = start + interval
+                    reservation = (key, (start, cost), interval, self.remaining[key])
+                    self.remaining[key] -= cost
+                    self.spent[key].append((start, cost))
+        if start > now:
+            metrics.inc('scheduler_wait_seconds_total', start - now, resource=resource)
+            time.sleep(start - now)
+        return token, reservation
+
+    def release(self, reservation, response):
+        """
+        Gives the slot of a request back when it cost nothing: a 304 Not Modified, or a
+        response whose remaining budget did not drop
+        """
+        if reservation is None:
+            return
+        key, entry, interval, remaining = reservation
+        if response.status_code != 304 and int(response.headers.get('X-RateLimit-Remaining', -1)) < remaining:
+            return
+        with self.lock:
+            try:
+                self.spent[key].remove(entry)
+            except ValueError:  # already out of the window
+                pass
+            if interval:
+                self.next_slot[key] = max(time.time(), self.next_slot.get(key, 0) - interval)
+            if response.status_code == 304 and key in self.remaining:  # no rate limit headers to learn it from
+                self.remaining[key] += entry[1]
+
+    def update(self, resource, remaining, reset, cost=None, token=None):
+        key = (resource, token)
+        with self.lock:
+            self.remaining[key] = remaining
+            self.reset[key] = reset
+            if cost is not None:
+                self.cost[key] = max(1, cost)
+        labels = {'resource': resource} if token is None else {'resource': resource, 'token': token}
+        metrics.gauge('rate_limit_remaining', remaining, **labels)
+        metrics.gauge('rate_limit_reset_timestamp', reset, **labels)
+
+    def block(self, seconds, token=None):
+        with self.lock:
+            self.blocked_until[token] = max(self.blocked_until.get(token, 0), time.time() + seconds)
+
+    def observe(self, response, resource, stream=False, token=None):
+        """
+        Updates the budget from a response
+        :param stream: if True the body of a successful response is left unread
+        :param token: index of the token used in the request (None: the caller's own)
+        :return: reason ('retry_after', 'primary', 'secondary' or 'graphql') if the response
+        was rate limited and the request should be retried, otherwise None
+        """
+        headers = response.headers
+        resource = headers.get('X-RateLimit-Resource', resource)
+        if 'X-RateLimit-Remaining' in headers and 'X-RateLimit-Reset' in headers:
+            self.update(resource, int(headers['X-RateLimit-Remaining']), int(headers['X-RateLimit-Reset']), token=token)
+
+        body = b'' if stream and response.status_code == 200 else response.content or b''
+        if resource == 'graphql' and b'"rateLimit"' in body:
+            try:
+                rate_limit = (response.json().get('data') or {}).get('rateLimit')
+            except ValueError:
+                rate_limit = None
+            if rate_limit:
+                self.update(resource, rate_limit['remaining'], parse_reset(rate_limit['resetAt']), rate_limit.get('cost'), token)
+
+        name = 'token' if token is None else f'token #{token}'
+        if response.status_code in (403, 429):
+            if 'Retry-After' in headers:  # secondary rate limit
+                print(f'Waiting for {headers["Retry-After"]} seconds before continuing ({name})...')
+                self.block(int(headers['Retry-After']), token)
+                return 'retry_after'
+            if headers.get('X-RateLimit-Remaining') == '0':  # primary rate limit
+                print(f'Rate limit reached for {resource} ({name}), waiting until {datetime.datetime.fromtimestamp(int(headers["X-RateLimit-Reset"])):%H:%M:%S}...')
+                self.update(resource, 0, int(headers['X-RateLimit-Reset']), token=token)
+                return 'primary'
+            if b'secondary rate limit' in body.lower():
+                print(f'Secondary rate limit reached ({name}), waiting {SECONDARY_BACKOFF} seconds...')
+                self.block(SECONDARY_BACKOFF, token)
+                return 'secondary'
+        elif resource == 'graphql' and b'RATE_LIMITED' in body:
+            with self.lock:
+                reset = self.reset.get((resource, token), time.time() + SECONDARY_BACKOFF)
+            print(f'GraphQL rate limit reached ({name}), waiting until {datetime.datetime.fromtimestamp(reset):%H:%M:%S}...')
+            self.update(resource, 0, reset, token=token)
+            return 'graphql'
+        return None
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request through the shared session, pacing it against the rate limit
+        and retrying it (up to MAX_RETRIES times) when GitHub reports a rate limit or, for
+        idempotent requests, a transient server or connection error (with exponential backoff).
+        Requests without an Authorization header are sent with a token from the pool.
+        Unless the caller passes timeout, a stalled connection fails after TIMEOUT seconds.
+        """
+        kwargs.setdefault('timeout', TIMEOUT)
+        resource = resource_for(url)
+        stream = kwargs.get('stream', False)
+        headers = dict(kwargs.pop('headers', None) or {})
+        own = 'Authorization' in headers or not self.tokens
+        for attempt in range(MAX_RETRIES):
+            token, reservation = self.wait(resource, (None,) if own else range(len(self.tokens)))
+            if token is not None:
+                headers['Authorization'] = f'bearer {self.tokens[token]}'
+            start = time.time()
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except requests.RequestException as e:
+                metrics.inc('request_errors_total', resource=resource, error=type(e).__name__)
+                metrics.event('request_error', method=method, url=url, resource=resource, attempt=attempt,
+                              elapsed=round(time.time() - start, 3), error=repr(e))
+                if method not in IDEMPOTENT or attempt == MAX_RETRIES - 1:
+                    raise
+                time.sleep(SERVER_ERROR_BACKOFF * 2 ** attempt)
+                continue
+            retry = self.observe(response, resource, stream, token)
+            if (not retry and method in IDEMPOTENT and response.status_code in SERVER_ERRORS
+                    and attempt < MAX_RETRIES - 1):
+                retry = 'server_error'
+            self.release(reservation, response)
+            record(method, url, resource, response, time.time() - start, attempt, retry, stream, token)
+            if not retry:
+                break
+            if retry == 'server_error':
+                response.close()
+                time.sleep(SERVER_ERROR_BACKOFF * 2 ** attempt)
+        return response
+
+
+_default = RateLimitScheduler()
+
+
+def has_tokens():
+    return bool(_default.tokens)
+
+
+def request(method, url, **kwargs):
+    return _default.request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return _default.request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return _default.request('POST', url, **kwargs)
@@ -0,0 +1,275 @@
+import csv
+import os
+import sqlite3
+import threading
+
+from util import DATABASE, PROJECTS_FILE, REPOS_BY_CODE, REPOS_BY_CODE_MEMBERSHIP, REPOS_DETAILS, REPOS_INTERSECT
+
+COUNTS = ['diskUsage', 'contributors', 'watchers', 'stargazers', 'forks', 'issues', 'commits', 'pullRequests',
+          'branches', 'tags', 'releases']
+
+# Columns (in CSV order) and SQLite types of each table; every table is keyed by repository (owner/name)
+TABLES = {
+    'projects': [
+        ('owner', 'TEXT'), ('name', 'TEXT'), ('createdAt', 'TEXT'), ('pushedAt', 'TEXT'), ('isMirror', 'BOOLEAN'),
+        ('diskUsage', 'INTEGER'), ('primaryLanguage', 'TEXT'), ('languages', 'INTEGER'),
+        ('contributors', 'INTEGER'), ('watchers', 'INTEGER'), ('stargazers', 'INTEGER'), ('forks', 'INTEGER'),
+        ('issues', 'INTEGER'), ('commits', 'INTEGER'), ('pullRequests', 'INTEGER'), ('branches', 'INTEGER'),
+        ('tags', 'INTEGER'), ('releases', 'INTEGER'), ('description', 'TEXT'), ('repository', 'TEXT'),
+    ],
+    'by_code': [('repository', 'TEXT'), ('search_string', 'TEXT')],
+    'by_code_membership': [('repository', 'TEXT'), ('search_string', 'TEXT')],
+    'details': [
+        ('repository', 'TEXT'), ('createdAt', 'TEXT'), ('pushedAt', 'TEXT'), ('isMirror', 'BOOLEAN'),
+        ('diskUsage', 'INTEGER'), ('description', 'TEXT'), ('contributors', 'INTEGER'), ('primaryLanguage', 'TEXT'),
+        ('languages', 'TEXT'), ('watchers', 'INTEGER'), ('stargazers', 'INTEGER'), ('forks', 'INTEGER'),
+        ('issues', 'INTEGER'), ('commits', 'INTEGER'), ('pullRequests', 'INTEGER'), ('branches', 'INTEGER'),
+        ('tags', 'INTEGER'), ('releases', 'INTEGER'), ('search_string', 'TEXT'),
+    ],
+}
+
+# Primary key of each table (by_code_membership has one row per repository and search string)
+KEYS = {
+    'projects': ('repository',),
+    'by_code': ('repository',),
+    'by_code_membership': ('repository', 'search_string'),
+    'details': ('repository',),
+}
+
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS projects_stargazers ON projects (stargazers)',
+    'CREATE INDEX IF NOT EXISTS projects_pushed ON projects (pushedAt)',
+    'CREATE INDEX IF NOT EXISTS by_code_membership_search_string ON by_code_membership (search_string)',
+    'CREATE INDEX IF NOT EXISTS details_stargazers ON details (stargazers)',
+    'CREATE INDEX IF NOT EXISTS details_pushed ON details (pushedAt)',
+]
+
+# CSV file of each table, imported when the table is still empty and kept up to date by export
+CSV_FILES = {
+    'projects': PROJECTS_FILE,
+    'by_code': REPOS_BY_CODE,
+    'by_code_membership': REPOS_BY_CODE_MEMBERSHIP,
+    'details': REPOS_DETAILS,
+}
+
+# Rows per executemany when importing a CSV
+CHUNK_SIZE = 10000
+
+# Keys per "WHERE repository IN (...)" query (SQLite limits the parameters of a statement)
+KEYS_PER_QUERY = 500
+
+
+def is_missing(value):
+    try:
+        return bool(value is None or value == '' or value != value)  # None, empty cell, NaN/NaT
+    except TypeError:  # pandas.NA
+        return True
+
+
+def to_sql(value, kind):
+    """
+    Converts a value from a collector row (or a CSV cell) to what is stored in SQLite
+    """
+    if is_missing(value):
+        return None
+    if kind == 'BOOLEAN':
+        return int(value in (True, 1, 'True', 'true', '1'))
+    if kind == 'INTEGER':
+        return int(float(value))
+    return str(value)
+
+
+def from_sql(value, kind):
+    if value is not None and kind == 'BOOLEAN':
+        return bool(value)
+    return value
+
+
+class Store:
+    """
+    Local SQLite database with one table per stage of the pipeline (projects, by_code,
+    by_code_membership, details), keyed by owner/name.
+
+    Collectors upsert only the rows they fetched, in one transaction per call, so a
+    checkpoint costs the same at the start and at the end of a crawl; the intersection
+    is an indexed join. The CSV files are still written by export for compatibility
+    (and imported the first time a table is used). Safe to share between threads.
+    """
+
+    def __init__(self, filename=DATABASE, import_csv=True):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            for table, columns in TABLES.items():
+                definitions = ', '.join(f'"{column}" {kind}' for column, kind in columns)
+                key = ', '.join(KEYS[table])
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS {table} ({definitions}, PRIMARY KEY ({key}))')
+            for index in INDEXES:
+                self.connection.execute(index)
+        if import_csv:
+            for table, filename in CSV_FILES.items():
+                if not self.count(table) and os.path.exists(filename):
+                    self.import_csv(table, filename)
+
+    def count(self, table):
+        with self.lock:
+            return self.connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def statement(self, table):
+        columns = ', '.join(f'"{column}"' for column, _ in TABLES[table])
+        placeholders = ', '.join('?' for _ in TABLES[table])
+        return f'INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})'
+
+    def values(self, table, row):
+        if table == 'projects' and 'repository' not in row:
+            row = dict(row, repository=f'{row["owner"]}/{row["name"]}')
+        return tuple(to_sql(row.get(column), kind) for column, kind in TABLES[table])
+
+    def upsert(self, table, rows):
+        """
+        Inserts or replaces rows (dicts with the columns of the table) in one transaction
+        :return: number of rows written
+        """
+        values = [self.values(table, row) for row in rows]
+        with self.lock, self.connection:
+            self.connection.executemany(self.statement(table), values)
+        return len(values)
+
+    def replace(self, table, rows):
+        """
+        Replaces all the rows of a table in one transaction (for stages that always
+        produce their complete result)
+        """
+        values = [self.values(table, row) for row in rows]
+        with self.lock, self.connection:
+            self.connection.execute(f'DELETE FROM {table}')
+            self.connection.executemany(self.statement(table), values)
+        return len(values)
+
+    def import_csv(self, table, filename):
+        print(f'Importing {filename} into the {table} table...', end=' ')
+        statement = self.statement(table)
+        rows = 0
+        with open(filename, 'r', newline='', encoding='utf-8') as file, self.lock, self.connection:
+            reader = csv.DictReader(file)
+            chunk = []
+            for row in reader:
+                if table == 'projects' and 'repository' not in row:
+                    row['repository'] = f'{row["owner"]}/{row["name"]}'
+                chunk.append(tuple(to_sql(row.get(column), kind) for column, kind in TABLES[table]))
+                if len(chunk) == CHUNK_SIZE:
+                    self.connection.executemany(statement, chunk)
+                    rows += len(chunk)
+                    chunk = []
+            self.connection.executemany(statement, chunk)
+            rows += len(chunk)
+        print(f'{rows} rows.')
+
+    def query(self, sql, parameters=()):
+        """
+        :return: list of dicts, one per row
+        """
+        with self.lock:
+            cursor = self.connection.execute(sql, parameters)
+            names = [description[0] for description in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def load(self, table, keys=None):
+        """
+        :param keys: repositories to read (None reads all of them)
+        :return: dict mapping owner/name to its row (as the collectors build them)
+        """
+        kinds = dict(TABLES[table])
+        if keys is None:
+            rows = self.query(f'SELECT * FROM {table}')
+        else:  # lookups by primary key, a chunk of keys per query
+            keys = list(dict.fromkeys(keys))
+            rows = []
+            for i in range(0, len(keys), KEYS_PER_QUERY):
+                chunk = keys[i:i + KEYS_PER_QUERY]
+                rows.extend(self.query(f'SELECT * FROM {table} WHERE repository IN ({", ".join("?" * len(chunk))})',
+                                       chunk))
+        return {
+            row['repository']: {column: from_sql(value, kinds[column]) for column, value in row.items()}
+            for row in rows
+        }
+
+    def get(self, table, repository):
+        """
+        :return: row of one repository (as the collectors build them), or None
+        """
+        kinds = dict(TABLES[table])
+        rows = self.query(f'SELECT * FROM {table} WHERE repository = ?', (repository,))
+        return {column: from_sql(value, kinds[column]) for column, value in rows[0].items()} if rows else None
+
+    def frame(self, sql, table=None, parameters=()):
+        """
+        Runs a query into a DataFrame with nullable integer and boolean columns
+        """
+        import pandas as pd
+
+        with self.lock:
+            df = pd.read_sql_query(sql, self.connection, params=parameters)
+        kinds = dict(TABLES[table]) if table else {column: 'INTEGER' for column in COUNTS}
+        kinds.setdefault('isMirror', 'BOOLEAN')
+        for column in df.columns:
+            if kinds.get(column) == 'INTEGER':
+                df[column] = df[column].astype('Int64')
+            elif kinds.get(column) == 'BOOLEAN':
+                df[column] = df[column].astype('boolean')
+        return df
+
+    def export(self, table, filename=None, order_by='rowid', columns=None):
+        """
+        Writes a table to its CSV file
+        :param columns: columns written (default: all of them, in TABLES order)
+        """
+        filename = filename or CSV_FILES[table]
+        columns = columns or [column for column, _ in TABLES[table]]
+        print(f'Saving {table} to {filename}...', end=' ')
+        selected = ', '.join(f'"{column}"' for column in columns)
+        df = self.frame(f'SELECT {selected} FROM {table} ORDER BY {order_by}', table)
+        df.to_csv(filename, index=False)
+        print('Done!')
+        return df
+
+    def intersect(self, filename=REPOS_INTERSECT):
+        """
+        Repositories found both by the repository search and by code search, as an
+        indexed join of projects and by_code, saved to REPOS_INTERSECT
+        """
+        from loaders import normalize_dates
+
+        print(f'Saving repositories to {filename}...', end=' ')
+        columns = ', '.join(f'p."{column}"' for column, _ in TABLES['projects'])
+        df = self.frame(
+            f'SELECT {columns}, b.search_string FROM projects p JOIN by_code b ON b.repository = p.repository '
+            f'ORDER BY p.stargazers DESC'
+        )
+        df.loc[df.description.str.contains('(?i)\\bmirror\\b', na=False), 'isMirror'] = True  # Check 'mirror' in the description
+        normalize_dates(df)
+        df.to_csv(filename, index=False)
+        print('Done!')
+        return df
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default():
+    """
+    Store shared by the collectors of this process (opened on first use)
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Store()
+        return _default
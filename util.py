@@ -3,10 +3,34 @@ import os
 # Directories
 SRC_DIR = os.path.dirname(os.path.realpath(__file__))
 BASE_DIR = os.path.dirname(SRC_DIR)
-RESOURCE_DIR = BASE_DIR + os.sep + 'resources'
+RESOURCE_DIR = os.getenv('RPA_RESOURCE_DIR', BASE_DIR + os.sep + 'resources')
+
+# GitHub API (GITHUB_API_URL may point to a local stand-in, see mock_github.py)
+API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GRAPHQL_URL = API_URL + '/graphql'
+QUERY_FILE = SRC_DIR + os.sep + 'query.graphql'
 
 # Files
 PROJECTS_FILE = RESOURCE_DIR + os.sep + 'projects_2025_rpa.csv'
 REPOS_BY_CODE = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code.csv'
+REPOS_BY_CODE_MEMBERSHIP = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code_membership.csv'
+REPOS_BY_CODE_PENDING = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code_pending.json'
 REPOS_INTERSECT = RESOURCE_DIR + os.sep + 'projects_2025_rpa_intersect.csv'
-REPOS_DETAILS = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code_details.csv'
\ No newline at end of file
+REPOS_DETAILS = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code_details.csv'
+REPOS_DETAILS_LOG = RESOURCE_DIR + os.sep + 'projects_2025_rpa_by_code_details.jsonl'
+DATABASE = RESOURCE_DIR + os.sep + 'projects_2025_rpa.sqlite3'
+REPORT_DIR = RESOURCE_DIR + os.sep + 'report'
+CONFIG_FILES = RESOURCE_DIR + os.sep + 'projects_2025_rpa_config_files.csv'
+CONFIG_ERRORS = RESOURCE_DIR + os.sep + 'projects_2025_rpa_config_errors.csv'
+CREDENTIALS = RESOURCE_DIR + os.sep + 'projects_2025_rpa_credentials.csv'
+
+# Caches
+HTTP_CACHE_DIR = RESOURCE_DIR + os.sep + 'cache' + os.sep + 'http'
+BLOB_CACHE_DIR = RESOURCE_DIR + os.sep + 'cache' + os.sep + 'blobs'
+ARCHIVE_CACHE_DIR = RESOURCE_DIR + os.sep + 'cache' + os.sep + 'archives'
+PAGE_SIZE_STATE = RESOURCE_DIR + os.sep + 'cache' + os.sep + 'page_sizes.json'
+SNAPSHOT_DIR = RESOURCE_DIR + os.sep + 'cache' + os.sep + 'snapshots'
+
+# Metrics
+METRICS_EVENTS = RESOURCE_DIR + os.sep + 'metrics' + os.sep + 'events.jsonl'
+METRICS_FILE = RESOURCE_DIR + os.sep + 'metrics' + os.sep + 'rpa_collectors.prom'